@@ -0,0 +1,18 @@
+from posts.paginators import POSTS_PER_PAGE
+from rest_framework.pagination import CursorPagination
+
+
+class FeedCursorPagination(CursorPagination):
+    """ Паджинация по курсору без COUNT(*) и OFFSET.
+
+    Порядок задаётся атрибутом ``cursor_ordering`` вьюсета. """
+    page_size = POSTS_PER_PAGE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-pk'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', self.ordering)
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
@@ -0,0 +1,50 @@
+from posts.models import Comment, Follow, Group, Post
+from rest_framework import serializers
+
+
+class SparseFieldsMixin:
+    """ Оставляет в ответе только поля из ``?fields=id,text``. """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        fields = request and request.query_params.get('fields')
+        if not fields:
+            return
+        requested = {name.strip() for name in fields.split(',')}
+        for name in set(self.fields) - requested:
+            self.fields.pop(name)
+
+
+class GroupSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Group
+        fields = ('id', 'title', 'slug', 'description')
+
+
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author = serializers.CharField(source='author.username')
+    group = serializers.SlugRelatedField(slug_field='slug', read_only=True)
+
+    class Meta:
+        model = Post
+        fields = (
+            'id', 'text', 'pub_date', 'author', 'group', 'image',
+            'comment_count')
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author = serializers.CharField(source='author.username')
+
+    class Meta:
+        model = Comment
+        fields = ('id', 'post', 'author', 'text', 'created')
+
+
+class FollowSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    user = serializers.CharField(source='user.username')
+    author = serializers.CharField(source='author.username')
+
+    class Meta:
+        model = Follow
+        fields = ('id', 'user', 'author')
@@ -0,0 +1,103 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from posts.models import Comment, Follow, Group, Post
+from rest_framework.test import APIClient
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """ Создание авторов, группы, постов и подписки. """
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(12)]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_posts_are_paginated_by_cursor(self):
+        """ Посты отдаются страницами по курсору, от новых к старым. """
+        response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(len(results), 10)
+        self.assertEqual(results[0]['text'], 'Пост 11')
+        self.assertEqual(results[0]['author'], 'author')
+        self.assertEqual(results[0]['group'], 'group')
+        self.assertNotIn('count', response.data)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [post['text'] for post in response.data['results']],
+            ['Пост 1', 'Пост 0'])
+
+    def test_posts_list_query_count(self):
+        """ Страница постов - один запрос, независимо от их числа. """
+        with self.assertNumQueries(1):
+            self.client.get('/api/v1/posts/')
+
+    def test_sparse_fieldsets(self):
+        """ ?fields= оставляет в ответе только перечисленные поля. """
+        response = self.client.get('/api/v1/posts/', {'fields': 'id,text'})
+        self.assertEqual(
+            set(response.data['results'][0]), {'id', 'text'})
+
+    def test_conditional_get(self):
+        """ Совпавший ETag даёт 304 без запросов к базе,
+        новый пост меняет ETag. """
+        response = self.client.get('/api/v1/posts/')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                '/api/v1/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(
+            '/api/v1/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_filters_and_comments(self):
+        """ Фильтр по группе и комментарии поста. """
+        response = self.client.get('/api/v1/posts/', {'group': 'other'})
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get(
+            f'/api/v1/posts/{self.posts[0].pk}/comments/')
+        self.assertEqual(response.data['results'][0]['author'], 'reader')
+        response = self.client.get('/api/v1/groups/')
+        self.assertEqual(response.data['results'][0]['slug'], 'group')
+        response = self.client.get('/api/v1/posts/0/comments/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_group_change_changes_posts_etag(self):
+        """ Новый slug группы есть в постах: ETag постов меняется. """
+        etag = self.client.get('/api/v1/posts/')['ETag']
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        response = self.client.get(
+            '/api/v1/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['group'], 'renamed')
+
+    def test_follow_requires_auth_and_is_read_only(self):
+        """ Подписки видны только самому пользователю, API только читает. """
+        self.assertEqual(self.client.get('/api/v1/follow/').status_code, 401)
+        self.client.force_authenticate(self.reader)
+        response = self.client.get('/api/v1/follow/')
+        self.assertEqual(response.data['results'][0]['author'], 'author')
+        response = self.client.post('/api/v1/posts/', {'text': 'Пост'})
+        self.assertEqual(response.status_code, 405)
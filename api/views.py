@@ -0,0 +1,97 @@
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, quote_etag
+from django_filters import rest_framework as filters
+from posts import feed_cache
+from posts.models import Group, Post
+from rest_framework import permissions, viewsets
+
+from .pagination import FeedCursorPagination
+from .serializers import (CommentSerializer, FollowSerializer,
+                          GroupSerializer, PostSerializer)
+
+
+class ConditionalMixin:
+    """ ETag и ответ 304 без обращения к базе.
+
+    ETag строится из версий лент ``posts.feed_cache``, которые сигналы
+    увеличивают при любом изменении данных, поэтому проверка
+    ``If-None-Match`` стоит одного запроса к кэшу. """
+    etag_feeds = ('index',)
+
+    def get_etag_feeds(self):
+        return self.etag_feeds
+
+    def get_etag(self):
+        request = self.request
+        return quote_etag(feed_cache.versioned_key(
+            'api', self.get_etag_feeds(), request.get_full_path(),
+            request.accepted_renderer.format, request.user.pk))
+
+    def conditional(self, handler, request, *args, **kwargs):
+        etag = self.get_etag()
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+
+class PostFilter(filters.FilterSet):
+    group = filters.CharFilter(field_name='group__slug')
+    author = filters.CharFilter(field_name='author__username')
+
+    class Meta:
+        model = Post
+        fields = ('group', 'author')
+
+
+class PostViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Post.objects.for_feed()
+    serializer_class = PostSerializer
+    permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+    pagination_class = FeedCursorPagination
+    cursor_ordering = ('-pub_date', '-pk')
+    filter_backends = (filters.DjangoFilterBackend,)
+    filterset_class = PostFilter
+    # В постах есть slug группы, а фильтр group идёт по slug.
+    etag_feeds = ('index', 'groups')
+
+
+class GroupViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Group.objects.all()
+    serializer_class = GroupSerializer
+    permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+    pagination_class = FeedCursorPagination
+    cursor_ordering = 'pk'
+    etag_feeds = ('groups',)
+
+
+class CommentViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    """ Комментарии поста; их изменения сбрасывают ленту 'index'. """
+    serializer_class = CommentSerializer
+    permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+    pagination_class = FeedCursorPagination
+    cursor_ordering = ('-created', '-pk')
+
+    def get_queryset(self):
+        post = get_object_or_404(Post, pk=self.kwargs['post_id'])
+        return post.comments.select_related('author')
+
+
+class FollowViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    """ Подписки текущего пользователя. """
+    serializer_class = FollowSerializer
+    pagination_class = FeedCursorPagination
+
+    def get_queryset(self):
+        return self.request.user.follower.select_related('user', 'author')
+
+    def get_etag_feeds(self):
+        return (f'follow:{self.request.user.pk}',)
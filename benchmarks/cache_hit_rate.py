@@ -0,0 +1,121 @@
+""" Доля попаданий в кэш лент у нескольких процессов.
+
+Запускает несколько процессов-воркеров, как gunicorn, и каждый из них
+читает случайные страницы лент через тестовый клиент Django.
+С locmem у каждого воркера свой холодный кэш, с общим бэкендом
+(file, memcached) воркеры пользуются результатами друг друга.
+
+    python benchmarks/cache_hit_rate.py --cache locmem
+    python benchmarks/cache_hit_rate.py --cache file --workers 8
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import random
+import re
+import tempfile
+import time
+
+from common import setup_django
+
+NEXT_CURSOR = re.compile(r'href="\?cursor=([^"]+)">Следующая')
+
+
+def seed(posts, authors, groups):
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from posts.models import Group, Post
+
+    users = [
+        User.objects.create_user(username=f'author{i}')
+        for i in range(authors)]
+    group_list = [
+        Group.objects.create(
+            title=f'Группа {i}', slug=f'group-{i}', description='-')
+        for i in range(groups)]
+    Post.objects.bulk_create(
+        Post(
+            text=f'Пост {i}',
+            author=random.choice(users),
+            group=random.choice(group_list))
+        for i in range(posts))
+    call_command('recount_stats', stdout=io.StringIO())
+    return (
+        ['/']
+        + [f'/group/{group.slug}/' for group in group_list]
+        + [f'/{user.username}/' for user in users])
+
+
+def worker(urls, requests, pages, seed_value):
+    from django.db import connection
+    from django.test import Client
+    from posts import feed_cache
+
+    connection.close()
+    random.seed(seed_value)
+    counters = {'hits': 0, 'misses': 0}
+    original_record = feed_cache.record
+
+    def record(hit):
+        counters['hits' if hit else 'misses'] += 1
+        original_record(hit)
+
+    feed_cache.record = record
+    client = Client()
+    cursors = {}
+    start = time.perf_counter()
+    for _ in range(requests):
+        url = random.choice(urls)
+        depth = random.randrange(pages)
+        # Курсоры страниц узнаём, проходя ленту от первой страницы.
+        chain = cursors.setdefault(url, [None])
+        while len(chain) <= depth and chain[-1] != '':
+            html = client.get(url, {'cursor': chain[-1] or ''}).content
+            found = NEXT_CURSOR.search(html.decode())
+            chain.append(found.group(1) if found else '')
+        cursor = chain[min(depth, len(chain) - 1)]
+        client.get(url, {'cursor': cursor or ''})
+    counters['seconds'] = time.perf_counter() - start
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cache', default='locmem',
+                        choices=('locmem', 'file', 'memcached'))
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--pages', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_django(workdir, args.cache)
+        urls = seed(args.posts, authors=20, groups=5)
+        from django.core.cache import cache
+        from django.db import connection
+        cache.clear()
+        connection.close()
+
+        ctx = multiprocessing.get_context('fork')
+        with ctx.Pool(args.workers) as pool:
+            results = pool.starmap(worker, [
+                (urls, args.requests, args.pages, i)
+                for i in range(args.workers)])
+
+    hits = sum(result['hits'] for result in results)
+    misses = sum(result['misses'] for result in results)
+    print(json.dumps({
+        'cache': args.cache,
+        'workers': args.workers,
+        'requests_per_worker': args.requests,
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / ((hits + misses) or 1), 3),
+        'worker_seconds': [round(r['seconds'], 2) for r in results],
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
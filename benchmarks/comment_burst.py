@@ -0,0 +1,137 @@
+""" Всплеск комментариев к одному популярному посту.
+
+Много потоков одновременно отправляют комментарии к одному посту
+через тестовый клиент Django - как воркеры сервера с потоками.
+Каждый режим работает в своём процессе со своей базой SQLite:
+обычная запись (каждый комментарий - своя транзакция) и пакетная
+запись ``posts.write_behind``. Часть форм отправляется повторно с
+тем же ключом, как при повторе запроса браузером; в базе
+их быть не должно.
+
+Считаются задержка, комментарии в секунду, ошибки
+(``database is locked`` и прочие) и лишние записи.
+
+    python benchmarks/comment_burst.py --threads 32 --comments 20
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from common import setup_django
+from request_paths import summarize
+
+MODES = ('direct', 'write-behind')
+
+
+def send_comments(url, client, options, results):
+    from django.db import connection
+
+    latencies = []
+    errors = {}
+    for number in range(options['comments']):
+        data = {'text': f'Комментарий {number} {uuid.uuid4()}',
+                'idempotency_key': str(uuid.uuid4())}
+        attempts = 2 if number % options['retry_every'] == 0 else 1
+        for _ in range(attempts):
+            start = time.perf_counter()
+            try:
+                response = client.post(url, data)
+                error = None if response.status_code == 302 else str(
+                    response.status_code)
+            except Exception as exc:
+                error = f'{type(exc).__name__}: {exc}'
+            latencies.append(time.perf_counter() - start)
+            if error is not None:
+                errors[error] = errors.get(error, 0) + 1
+    connection.close()
+    results.append((latencies, errors))
+
+
+def run_mode(mode, options):
+    """ Одна серия всплесков; выполняется в отдельном процессе. """
+    os.environ['YATUBE_WRITE_BEHIND'] = '1' if mode == 'write-behind' else ''
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_django(workdir)
+        from django.contrib.auth.models import User
+        from django.test import Client
+        from django.urls import reverse
+        from posts import write_behind
+        from posts.models import Comment, Post
+
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(text='Популярный пост', author=author)
+        # Вход до всплеска: меряются только комментарии.
+        clients = []
+        for number in range(options['threads']):
+            client = Client()
+            client.force_login(
+                User.objects.create_user(username=f'reader{number}'))
+            clients.append(client)
+        url = reverse('add_comment', args=[author.username, post.pk])
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=send_comments, args=(url, client, options, results))
+            for client in clients]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        write_behind.queue.flush()
+
+        latencies = [
+            seconds for thread_latencies, _ in results
+            for seconds in thread_latencies]
+        errors = {}
+        for _, thread_errors in results:
+            for error, count in thread_errors.items():
+                errors[error] = errors.get(error, 0) + count
+        expected = options['threads'] * options['comments']
+        saved = Comment.objects.count()
+        post.refresh_from_db()
+        summary = summarize(latencies, sum(errors.values()), elapsed)
+        summary.update({
+            'comments_per_second': round(saved / elapsed, 1),
+            'saved': saved,
+            'expected': expected,
+            # у каждой формы свой текст: повтор - это дубликат
+            'duplicates': saved - Comment.objects.values(
+                'text').distinct().count(),
+            'comment_count': post.comment_count,
+            'error_kinds': errors,
+        })
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--comments', type=int, default=20,
+                        help='Комментариев от каждого потока.')
+    parser.add_argument('--retry-every', type=int, default=5,
+                        help='Каждая N-я форма отправляется дважды.')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    args = parser.parse_args()
+
+    options = vars(args)
+    results = {'options': {
+        name: options[name] for name in ('threads', 'comments',
+                                         'retry_every')}}
+    ctx = multiprocessing.get_context('fork')
+    for mode in args.modes:
+        with ctx.Pool(1) as pool:
+            results[mode] = pool.apply(run_mode, (mode, options))
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+""" Общая настройка Django для скриптов бенчмарков.
+
+Каждый бенчмарк работает во временном каталоге со своей базой SQLite
+и каталогом медиафайлов, не трогая db.sqlite3 и media проекта. """
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(workdir, cache_name='locmem', migrate=True):
+    os.environ['YATUBE_CACHE'] = cache_name
+    if cache_name == 'file':
+        os.environ.setdefault(
+            'YATUBE_CACHE_LOCATION', os.path.join(workdir, 'cache'))
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'yatube.settings'
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = os.path.join(
+        workdir, 'db.sqlite3')
+    settings.MEDIA_ROOT = os.path.join(workdir, 'media')
+    settings.DEBUG = False
+    django.setup()
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
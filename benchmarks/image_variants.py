@@ -0,0 +1,114 @@
+""" Байты картинок на страницу ленты до и после адаптивных копий.
+
+Создаёт синтетические «фотографии», строит для них прежнюю единственную
+миниатюру 960x1000 и новые копии разной ширины в JPEG и WebP,
+а затем считает, сколько байт картинок скачает страница ленты
+из POSTS_PER_PAGE постов для разных клиентов.
+
+    python benchmarks/image_variants.py --images 10
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from common import setup_django
+
+# (ширина окна, плотность пикселей, поддержка WebP)
+CLIENTS = {
+    'mobile': (400, 1, True),
+    'mobile_retina': (400, 2, True),
+    'desktop': (1200, 1, True),
+    'legacy_mobile': (400, 1, False),
+}
+
+
+def make_photo(path, index):
+    """ Картинка с градиентом и шумом, похожая по сжатию на фото. """
+    from PIL import Image, ImageChops
+
+    size = (2400, 1800)
+    noise = Image.effect_noise(size, 40 + index).convert('RGB')
+    gradient = Image.linear_gradient('L').resize(size).convert('RGB')
+    photo = ImageChops.blend(noise, gradient, 0.6)
+    photo.save(path, 'JPEG', quality=90)
+
+
+def pick(variants, viewport, density):
+    """ Копия, которую выберет браузер по srcset и sizes. """
+    needed = min(viewport, 960) * density
+    for width, size in variants:
+        if width >= needed:
+            return size
+    return variants[-1][1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--images', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_django(workdir)
+        from django.core.files.storage import default_storage
+        from posts import thumbnails
+        from posts.paginators import POSTS_PER_PAGE
+
+        os.makedirs(os.path.join(workdir, 'media', 'posts'))
+        names = []
+        for index in range(args.images):
+            name = f'posts/photo{index}.jpg'
+            make_photo(default_storage.path(name), index)
+            names.append(name)
+
+        geometry, options = thumbnails.THUMBNAIL_SIZES['feed']
+        before_bytes, before_ms = [], []
+        for name in names:
+            start = time.perf_counter()
+            thumb = thumbnails.backend.get_thumbnail(
+                name, geometry, **options)
+            before_ms.append((time.perf_counter() - start) * 1000)
+            before_bytes.append(default_storage.size(thumb.name))
+
+        # Прежняя миниатюра уже есть, создаём только новые копии.
+        after_ms = []
+        for name in names:
+            start = time.perf_counter()
+            thumbnails.generate_thumbnails(name)
+            after_ms.append((time.perf_counter() - start) * 1000)
+
+        variant_sizes = {}
+        for format in thumbnails.VARIANT_FORMATS:
+            variant_sizes[format] = [
+                [(width, default_storage.size(
+                    thumbnails.backend.get_thumbnail(
+                        name, variant_geometry, **variant_options).name))
+                 for width, variant_geometry, variant_options
+                 in thumbnails.variants('feed', format)]
+                for name in names]
+
+    page_factor = POSTS_PER_PAGE / len(names)
+    before_page = round(sum(before_bytes) * page_factor)
+    clients = {}
+    for client, (viewport, density, webp) in CLIENTS.items():
+        sizes = variant_sizes['WEBP' if webp else None]
+        after_page = round(
+            sum(pick(image, viewport, density) for image in sizes)
+            * page_factor)
+        clients[client] = {
+            'bytes_per_page_before': before_page,
+            'bytes_per_page_after': after_page,
+            'saved': round(1 - after_page / before_page, 3),
+        }
+    print(json.dumps({
+        'images': len(names),
+        'clients': clients,
+        'ms_per_image_single_thumbnail': round(
+            sum(before_ms) / len(names), 1),
+        'ms_per_image_extra_variants': round(sum(after_ms) / len(names), 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+""" Задержка и пропускная способность основных страниц.
+
+Для каждого масштаба (по умолчанию 10 тысяч, 100 тысяч и миллион
+постов) в отдельном процессе создаётся база с синтетическими данными
+``posts.bulk.generate``: авторы постов и подписок распределены по
+закону Ципфа. Затем тестовый клиент Django последовательно
+запрашивает index, group_posts, profile, post_view, follow_index,
+new_post и add_comment со случайными группами, авторами и постами
+(популярные выбираются чаще) и считает перцентили задержки
+и число запросов в секунду.
+
+Результат - JSON; сохранённый через --output файл можно сравнить
+с прогоном на другом коммите через --compare.
+
+    python benchmarks/request_paths.py --scales 10000 --output before.json
+    python benchmarks/request_paths.py --scales 10000 --compare before.json
+    python benchmarks/request_paths.py --cold   # кэш чистится перед запросом
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import subprocess
+import tempfile
+import time
+
+from common import BASE_DIR, setup_django
+
+VIEWS = (
+    'index', 'group_posts', 'profile', 'post_view', 'follow_index',
+    'new_post', 'add_comment')
+PERCENTILES = (50, 90, 95, 99)
+READERS = 20
+
+
+def dataset_size(posts):
+    """ Размеры остальных таблиц для заданного числа постов. """
+    users = max(posts // 20, 50)
+    return {
+        'users': users,
+        'groups': max(posts // 5000, 10),
+        'posts': posts,
+        'comments': posts // 2,
+        'follows': users * 10,
+    }
+
+
+def percentile(ordered, percent):
+    """ Перцентиль по ближайшему рангу из отсортированного списка. """
+    rank = max(round(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    summary = {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': round(len(ordered) / elapsed, 1),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+    for percent in PERCENTILES:
+        summary[f'p{percent}_ms'] = round(
+            percentile(ordered, percent) * 1000, 2)
+    return summary
+
+
+class Targets:
+    """ Случайные адреса страниц; популярные авторы и их посты
+    выбираются чаще, как в самих данных. """
+
+    def __init__(self, rng):
+        from django.contrib.auth.models import User
+        from django.db.models import Count
+        from posts.models import Group, Post
+
+        self.rng = rng
+        self.groups = list(Group.objects.values_list('slug', flat=True))
+        authors = list(User.objects.annotate(
+            post_count=Count('posts')).filter(post_count__gt=0).values_list(
+                'username', 'post_count'))
+        self.authors = [name for name, _ in authors]
+        self.author_weights = [count for _, count in authors]
+        top = Post.objects.order_by('-pk').values_list('pk', flat=True)
+        self.last_post = top.first()
+        self.readers = list(User.objects.annotate(
+            follow_count=Count('follower')
+        ).order_by('-follow_count')[:READERS])
+
+    def post(self):
+        from posts.models import Post
+
+        # Случайный id ниже максимального: пропусков в id нет.
+        pk = self.rng.randint(1, self.last_post)
+        return Post.objects.filter(pk__lte=pk).order_by('-pk').values_list(
+            'author__username', 'pk').first()
+
+    def author(self):
+        return self.rng.choices(self.authors, self.author_weights)[0]
+
+    def request(self, view, clients):
+        """ Клиент, метод, адрес, данные и ожидаемый код ответа. """
+        from django.urls import reverse
+
+        client = self.rng.choice(clients)
+        if view == 'index':
+            return client, 'get', reverse('index'), None, 200
+        if view == 'group_posts':
+            slug = self.rng.choice(self.groups)
+            return client, 'get', reverse('group', args=[slug]), None, 200
+        if view == 'profile':
+            url = reverse('profile', args=[self.author()])
+            return client, 'get', url, None, 200
+        if view == 'follow_index':
+            return client, 'get', reverse('follow_index'), None, 200
+        if view == 'new_post':
+            data = {'text': f'Пост бенчмарка {self.rng.random()}'}
+            return client, 'post', reverse('new_post'), data, 302
+        username, pk = self.post()
+        if view == 'post_view':
+            url = reverse('post', args=[username, pk])
+            return client, 'get', url, None, 200
+        data = {'text': 'Комментарий бенчмарка'}
+        url = reverse('add_comment', args=[username, pk])
+        return client, 'post', url, data, 302
+
+
+def measure(view, targets, clients, requests, warmup, cold):
+    from django.core.cache import cache
+
+    latencies = []
+    errors = 0
+    elapsed = 0.0
+    for number in range(warmup + requests):
+        client, method, url, data, expected = targets.request(view, clients)
+        if cold:
+            cache.clear()
+        start = time.perf_counter()
+        response = getattr(client, method)(url, data)
+        seconds = time.perf_counter() - start
+        if number < warmup:
+            continue
+        latencies.append(seconds)
+        elapsed += seconds
+        errors += response.status_code != expected
+    return summarize(latencies, errors, elapsed)
+
+
+def run_scale(posts, options):
+    """ Заполняет базу и замеряет все страницы; выполняется
+    в отдельном процессе со своей базой. """
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_django(workdir, options['cache'])
+        from django.core.cache import cache
+        from django.test import Client
+        from posts import bulk
+
+        size = dataset_size(posts)
+        start = time.perf_counter()
+        bulk.generate(seed=options['seed'], **size)
+        seed_seconds = time.perf_counter() - start
+        cache.clear()
+
+        targets = Targets(random.Random(options['seed']))
+        clients = []
+        for reader in targets.readers:
+            client = Client()
+            client.force_login(reader)
+            clients.append(client)
+        views = {
+            view: measure(
+                view, targets, clients, options['requests'],
+                options['warmup'], options['cold'])
+            for view in options['views']}
+    return {
+        'dataset': size,
+        'seed_seconds': round(seed_seconds, 1),
+        'views': views,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """ Строки «масштаб вид: p50 и p95 было -> стало». """
+    lines = []
+    for scale, current in results['scales'].items():
+        before = baseline['scales'].get(scale)
+        if before is None:
+            continue
+        for view, stats in current['views'].items():
+            old = before['views'].get(view)
+            if old is None:
+                continue
+            lines.append(
+                f'{scale:>8} {view:<13} '
+                f'p50 {old["p50_ms"]:8.2f} -> {stats["p50_ms"]:8.2f} мс  '
+                f'p95 {old["p95_ms"]:8.2f} -> {stats["p95_ms"]:8.2f} мс')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument(
+        '--scales', type=int, nargs='+',
+        default=[10_000, 100_000, 1_000_000], help='Число постов.')
+    parser.add_argument('--views', nargs='+', choices=VIEWS, default=VIEWS)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--cold', action='store_true',
+                        help='Чистить кэш перед каждым запросом.')
+    parser.add_argument('--cache', default='locmem',
+                        choices=('locmem', 'file', 'memcached'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Сохранить результат в файл.')
+    parser.add_argument('--compare', help='Файл прошлого прогона.')
+    args = parser.parse_args()
+
+    options = vars(args)
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'options': {
+            name: options[name] for name in (
+                'requests', 'warmup', 'cold', 'cache', 'seed')},
+        'scales': {},
+    }
+    # Каждый масштаб - в своём процессе: Django настраивается
+    # один раз на процесс, а у масштаба своя база.
+    ctx = multiprocessing.get_context('fork')
+    for posts in args.scales:
+        with ctx.Pool(1) as pool:
+            results['scales'][str(posts)] = pool.apply(
+                run_scale, (posts, options))
+
+    report = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            output.write(report + '\n')
+    print(report)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline:
+            print(compare(results, json.load(baseline)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+""" Поиск по индексу FTS5 против LIKE '%слово%'.
+
+Заполняет синтетическую таблицу постов (по умолчанию миллион строк)
+текстами из словаря с распределением Ципфа и сравнивает время первой
+страницы выдачи для частых и редких слов: через ``posts.search`` и
+через ``text__icontains``, как было в админке.
+
+    python benchmarks/search.py
+    python benchmarks/search.py --rows 100000 --repeat 3
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+
+from common import setup_django
+
+
+def vocabulary(size):
+    # Слова одной длины: ни одно не входит в другое подстрокой,
+    # поэтому LIKE и индекс находят одни и те же посты.
+    return [f'слово{index:05d}' for index in range(size)]
+
+
+def seed(rows, words, batch=20000):
+    from django.contrib.auth.models import User
+    from django.db import connection, transaction
+    from django.utils import timezone
+    from posts import search
+
+    author = User.objects.create_user(username='author')
+    rng = random.Random(1)
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    now = timezone.now().isoformat()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, rows, batch):
+            cursor.executemany(
+                'INSERT INTO posts_post '
+                '(text, pub_date, author_id, comment_count) '
+                'VALUES (%s, %s, %s, 0)',
+                [(' '.join(rng.choices(words, weights, k=12)), now,
+                  author.pk)
+                 for _ in range(min(batch, rows - start))])
+        search.get_backend().rebuild()
+
+
+def timed(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--words', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_django(workdir)
+        from posts import search
+        from posts.models import Post
+
+        words = vocabulary(args.words)
+        start = time.perf_counter()
+        seed(args.rows, words)
+        seed_seconds = time.perf_counter() - start
+
+        results = {}
+        # Самое частое, среднее и самое редкое слово.
+        for word in (words[0], words[len(words) // 2], words[-1]):
+            paginator = search.SearchPaginator(word, 10)
+            fts_seconds, _ = timed(
+                lambda: list(paginator.get_page(None)), args.repeat)
+            like_seconds, _ = timed(
+                lambda: list(Post.objects.for_feed().filter(
+                    text__icontains=word).order_by('-pk')[:10]),
+                args.repeat)
+            fts_count_seconds, count = timed(
+                lambda: search.get_backend().filter_queryset(
+                    Post.objects.all(), word).count(), args.repeat)
+            like_count_seconds, like_count = timed(
+                lambda: Post.objects.filter(text__icontains=word).count(),
+                args.repeat)
+            results[word] = {
+                'fts_matches': count,
+                'like_matches': like_count,
+                'fts_page_ms': round(fts_seconds * 1000, 2),
+                'like_page_ms': round(like_seconds * 1000, 2),
+                'fts_count_ms': round(fts_count_seconds * 1000, 2),
+                'like_count_ms': round(like_count_seconds * 1000, 2),
+            }
+
+    print(json.dumps({
+        'rows': args.rows,
+        'seed_seconds': round(seed_seconds, 1),
+        'queries': results,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
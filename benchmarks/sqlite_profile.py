@@ -0,0 +1,132 @@
+""" Чтение и запись под параллельной нагрузкой в профилях базы.
+
+Для каждого профиля (``YATUBE_DB_PROFILE``: default и production)
+в отдельном процессе создаётся база с данными ``posts.bulk.generate``,
+после чего потоки-читатели открывают страницы постов и профилей,
+а потоки-писатели добавляют комментарии, пока не выйдет время.
+После каждого запроса соединения закрываются так же, как это делает
+обработчик запросов Django: с ``CONN_MAX_AGE`` они переживают запрос.
+
+Считаются запросы в секунду, перцентили задержки и ошибки
+(``database is locked``) отдельно для чтения и для записи.
+
+    python benchmarks/sqlite_profile.py --readers 8 --writers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+from common import setup_django
+from request_paths import Targets, dataset_size, summarize
+
+PROFILES = ('default', 'production')
+READ_VIEWS = ('post_view', 'profile')
+WRITE_VIEWS = ('add_comment',)
+
+
+def load(targets, client, views, deadline, results):
+    from django.db import close_old_connections
+
+    latencies = []
+    errors = 0
+    while time.perf_counter() < deadline:
+        view = targets.rng.choice(views)
+        _, method, url, data, expected = targets.request(view, [client])
+        start = time.perf_counter()
+        try:
+            response = getattr(client, method)(url, data)
+            errors += response.status_code != expected
+        except Exception:
+            errors += 1
+        finally:
+            close_old_connections()
+        latencies.append(time.perf_counter() - start)
+    results.append((latencies, errors))
+
+
+def run_profile(profile, options):
+    """ Замер одного профиля; выполняется в отдельном процессе. """
+    os.environ['YATUBE_DB_PROFILE'] = profile
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_django(workdir)
+        from django.db import connection
+        from django.test import Client
+        from posts import bulk
+
+        bulk.generate(seed=options['seed'], **dataset_size(options['posts']))
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode, = cursor.fetchone()
+        connection.close()
+
+        workers = (
+            [READ_VIEWS] * options['readers']
+            + [WRITE_VIEWS] * options['writers'])
+        tasks = []
+        for number, views in enumerate(workers):
+            targets = Targets(random.Random(options['seed'] + number))
+            client = Client()
+            client.force_login(targets.readers[number % len(targets.readers)])
+            tasks.append((targets, client, views))
+        connection.close()
+
+        reads, writes = [], []
+        deadline = time.perf_counter() + options['duration']
+        threads = [
+            threading.Thread(target=load, args=(
+                targets, client, views, deadline,
+                reads if views is READ_VIEWS else writes))
+            for targets, client, views in tasks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    result = {'journal_mode': journal_mode}
+    for kind, results in (('read', reads), ('write', writes)):
+        latencies = [
+            seconds for thread_latencies, _ in results
+            for seconds in thread_latencies]
+        if latencies:
+            summary = summarize(
+                latencies, sum(errors for _, errors in results),
+                options['duration'])
+            result[kind] = summary
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES,
+                        default=PROFILES)
+    parser.add_argument('--posts', type=int, default=20_000)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=20,
+                        help='Секунд нагрузки на профиль.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    options = vars(args)
+    results = {
+        'options': {
+            name: options[name]
+            for name in ('posts', 'readers', 'writers', 'duration')},
+        'profiles': {},
+    }
+    ctx = multiprocessing.get_context('fork')
+    for profile in args.profiles:
+        with ctx.Pool(1) as pool:
+            results['profiles'][profile] = pool.apply(
+                run_profile, (profile, options))
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+""" Время запуска: django.setup() и импорт адресов.
+
+Каждый замер - отдельный процесс Python с пустой базой без миграций:
+модуль, который при импорте обращается к базе, либо откроет
+соединение, либо упадёт на отсутствующей таблице. Для каждого
+процесса записывается время настройки Django, время загрузки
+urls.py (вместе с представлениями и формами) и было ли открыто
+соединение с базой.
+
+    python benchmarks/startup.py --runs 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import setup_django
+
+
+def measure_once():
+    """ Один замер в текущем процессе; печатает JSON. """
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        setup_django(workdir, migrate=False)
+        setup_seconds = time.perf_counter() - start
+
+        from django.db import connections
+        from django.urls import get_resolver
+
+        start = time.perf_counter()
+        error = None
+        try:
+            get_resolver().url_patterns
+        except Exception as exc:
+            error = f'{type(exc).__name__}: {exc}'
+        urls_seconds = time.perf_counter() - start
+        touched = [
+            alias for alias in connections
+            if connections[alias].connection is not None]
+    print(json.dumps({
+        'setup_ms': round(setup_seconds * 1000, 1),
+        'urls_ms': round(urls_seconds * 1000, 1),
+        'db_connections': touched,
+        'error': error,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--once', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.once:
+        measure_once()
+        return
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, __file__, '--once'],
+            capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    print(json.dumps({
+        'runs': args.runs,
+        'setup_ms': statistics.median(run['setup_ms'] for run in runs),
+        'urls_ms': statistics.median(run['urls_ms'] for run in runs),
+        'touched_db': any(run['db_connections'] for run in runs),
+        'errors': sorted({run['error'] for run in runs if run['error']}),
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,29 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from . import search
+from .models import Comment, Follow, Group, Post, UserStats
+
+
+class IndexedSearchMixin:
+    """Поиск в админке через полнотекстовый индекс вместо LIKE."""
+    search_post_field = "pk"
+    search_column = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        queryset = search.get_backend().filter_queryset(
+            queryset, search_term, self.search_post_field,
+            self.search_column)
+        return queryset, False
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(IndexedSearchMixin, admin.ModelAdmin):
     """Класс для вывода объектов класса Post в админке."""
     list_display = ("pk", "text", "pub_date", "author", "group")
     search_fields = ("text",)
+    search_column = "text"
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
@@ -21,12 +37,22 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(IndexedSearchMixin, admin.ModelAdmin):
     """Класс для вывода объектов класса Comment в админке."""
     list_display = ("pk", "text", "author", "post")
     search_fields = ("text",)
+    search_post_field = "post"
+    search_column = "comments"
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        # Индекс находит посты, а LIKE среди их комментариев
+        # оставляет только подходящие.
+        queryset, _ = super().get_search_results(
+            request, queryset, search_term)
+        return admin.ModelAdmin.get_search_results(
+            self, request, queryset, search_term)
+
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
@@ -34,3 +60,12 @@ class FollowAdmin(admin.ModelAdmin):
     list_display = ("user", "author")
     search_fields = ("user",)
     empty_value_display = "-пусто-"
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    """Класс для вывода счётчиков пользователей в админке."""
+    list_display = (
+        "user", "posts_count", "followers_count", "following_count")
+    search_fields = ("user__username",)
+    empty_value_display = "-пусто-"
@@ -0,0 +1,314 @@
+""" Массовая загрузка данных в обход сигналов и save().
+
+Объекты копятся в буферах по моделям и вставляются ``bulk_create``
+пачками, каждая пачка - в своей транзакции. Родительские модели
+сбрасываются раньше дочерних (User, Group, Post, Comment, Follow),
+а внешние ключи проверяются один раз в конце загрузки, как это делает
+``loaddata``. Производные данные (счётчики, ленты подписок, поисковый
+индекс) пересчитываются после загрузки, затем сбрасываются версии
+затронутых лент в кэше. """
+import gzip
+import json
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import feed_cache, search, signals, timeline
+from .models import Comment, Follow, Group, Post, UserStats
+from .stats import USER_COUNTERS, count_related, last_post_date
+
+User = get_user_model()
+# Порядок вставки: сначала модели, на которые ссылаются другие.
+MODELS = (User, Group, Post, Comment, Follow)
+BATCH_SIZE = 5000
+CHUNK_SIZE = 64 * 1024
+WORDS = (
+    'котик', 'собака', 'город', 'река', 'утро', 'вечер', 'книга', 'чай',
+    'дорога', 'море', 'лес', 'снег', 'солнце', 'дождь', 'поезд', 'друг',
+    'работа', 'отпуск', 'музыка', 'кино', 'код', 'сервер', 'база',
+    'запрос', 'индекс', 'кэш', 'лента', 'подписка', 'пост', 'новость',
+)
+
+
+def open_fixture(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def iter_json_array(stream, chunk_size=CHUNK_SIZE):
+    """ Объекты JSON-массива верхнего уровня по одному.
+
+    В памяти держится только текущий кусок файла,
+    а не весь документ, как у ``json.load``. """
+    decoder = json.JSONDecoder()
+    buffer = stream.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидался JSON-массив.')
+    position, eof = 1, False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position == len(buffer):
+            if eof:
+                raise ValueError('Неожиданный конец JSON-массива.')
+            buffer, position = stream.read(chunk_size), 0
+            eof = not buffer
+            continue
+        if buffer[position] == ']':
+            return
+        try:
+            obj, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # Объект не поместился в прочитанный кусок.
+            if eof:
+                raise
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield obj
+
+
+@contextmanager
+def raw_dates(models):
+    """ Отключает auto_now/auto_now_add, чтобы bulk_create
+    сохранил даты из дампа. """
+    fields = [
+        field for model in models for field in model._meta.local_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+@contextmanager
+def deferred_indexes(models):
+    """ Удаляет неуникальные индексы таблиц на время загрузки
+    и создаёт их заново в конце. Работает только на SQLite. """
+    if connection.vendor != 'sqlite':
+        yield []
+        return
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+            "AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%%' "
+            f"AND tbl_name IN ({', '.join(['%s'] * len(tables))})",
+            tables)
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX "{name}"')
+    try:
+        yield [name for name, _ in indexes]
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+
+
+class BulkLoader:
+    """ Буферы объектов по моделям с пакетной вставкой. """
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.buffers = {model: [] for model in MODELS}
+        self.counts = {model: 0 for model in MODELS}
+        # Ленты, которые изменила загрузка, и посты с новыми
+        # комментариями: их ленты известны только по строке поста.
+        self.feeds = {'index', 'groups', 'group-stats'}
+        self.commented = set()
+
+    def add(self, obj):
+        model = type(obj)
+        self.buffers[model].append(obj)
+        if len(self.buffers[model]) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model=None):
+        """ Вставляет буфер model и буферы всех моделей перед ней
+        (или все буферы, если model не указана). """
+        last = MODELS.index(model) if model else len(MODELS) - 1
+        with transaction.atomic():
+            for parent in MODELS[:last + 1]:
+                objects = self.buffers[parent]
+                if objects:
+                    # Размер одного INSERT Django выбирает сама
+                    # по ограничениям базы на число параметров.
+                    parent.objects.bulk_create(objects)
+                    self.counts[parent] += len(objects)
+                    self.buffers[parent] = []
+                    for obj in objects:
+                        self.track(obj)
+
+    def track(self, obj):
+        if isinstance(obj, Post):
+            self.feeds.update(feed_cache.post_feeds(obj))
+            self.feeds.add(f'stats:{obj.author_id}')
+        elif isinstance(obj, Comment):
+            self.commented.add(obj.post_id)
+        elif isinstance(obj, Follow):
+            self.feeds.update(signals.follow_feeds(obj))
+        elif isinstance(obj, Group):
+            self.feeds.add(f'group:{obj.pk}')
+
+
+@contextmanager
+def bulk_loading(batch_size=BATCH_SIZE, defer_indexes=False):
+    """ Контекст загрузки: отдаёт BulkLoader, в конце сбрасывает
+    буферы, проверяет внешние ключи и пересчитывает производные
+    данные. """
+    loader = BulkLoader(batch_size)
+    tables = [model._meta.db_table for model in MODELS]
+    with raw_dates(MODELS):
+        with connection.constraint_checks_disabled():
+            if defer_indexes:
+                with deferred_indexes(MODELS):
+                    yield loader
+                    loader.flush()
+            else:
+                yield loader
+                loader.flush()
+        connection.check_constraints(table_names=tables)
+    reset_sequences()
+    rebuild_derived()
+    bump_feeds(loader)
+
+
+def reset_sequences():
+    # После вставки с явными id счётчики последовательностей
+    # (PostgreSQL и др.) нужно подвинуть за максимальный id.
+    statements = connection.ops.sequence_reset_sql(no_style(), MODELS)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def rebuild_derived():
+    """ То, что при обычном save() делают сигналы. """
+    # Счётчики пересчитываются целиком по одному UPDATE на поле:
+    # построчная сверка recount_stats здесь слишком медленная.
+    Post.objects.update(comment_count=count_related(Comment, 'post'))
+    Group.objects.update(
+        posts_count=count_related(Post, 'group'),
+        last_post_at=last_post_date())
+    UserStats.objects.bulk_create(
+        UserStats(user_id=pk) for pk in User.objects.filter(
+            stats__isnull=True).values_list('pk', flat=True).iterator())
+    UserStats.objects.update(**{
+        name: count_related(model, field, 'user_id')
+        for name, (model, field) in USER_COUNTERS.items()})
+    timeline.rebuild()
+    search.get_backend().rebuild()
+
+
+def bump_feeds(loader):
+    """ Сбрасывает кэш лент, которые изменила загрузка. """
+    feeds = set(loader.feeds)
+    commented = sorted(loader.commented)
+    for start in range(0, len(commented), BATCH_SIZE):
+        posts = Post.objects.filter(
+            pk__in=commented[start:start + BATCH_SIZE]
+        ).only('author_id', 'group_id')
+        for post in posts:
+            feeds.update(feed_cache.post_feeds(post))
+    feed_cache.bump(*sorted(feeds))
+
+
+def load_fixture(path, batch_size=BATCH_SIZE, defer_indexes=False):
+    """ Загружает дамп ``dumpdata`` потоком.
+
+    Возвращает количество загруженных объектов по моделям
+    и количество пропущенных объектов других моделей. """
+    from django.core.serializers.python import Deserializer
+
+    labels = {model._meta.label_lower for model in MODELS}
+    skipped = 0
+
+    def supported(objects):
+        nonlocal skipped
+        for obj in objects:
+            if obj.get('model') in labels:
+                yield obj
+            else:
+                skipped += 1
+
+    with open_fixture(path) as stream:
+        with bulk_loading(batch_size, defer_indexes) as loader:
+            for item in Deserializer(supported(iter_json_array(stream))):
+                loader.add(item.object)
+    return loader.counts, skipped
+
+
+def next_pk(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def generate(users, groups, posts, comments, follows, seed=0,
+             batch_size=BATCH_SIZE, defer_indexes=False):
+    """ Синтетический набор данных заданного размера для бенчмарков.
+
+    Даты постов равномерно распределены по последнему году,
+    авторы постов и подписок выбираются по закону Ципфа:
+    у немногих авторов много постов и подписчиков. """
+    rng = random.Random(seed)
+    first = {model: next_pk(model) for model in MODELS}
+    user_ids = range(first[User], first[User] + users)
+    group_ids = range(first[Group], first[Group] + groups)
+    post_ids = range(first[Post], first[Post] + posts)
+    popularity = list(accumulate(1 / rank for rank in range(1, users + 1)))
+    now = timezone.now()
+    year = timedelta(days=365).total_seconds()
+
+    with bulk_loading(batch_size, defer_indexes) as loader:
+        for pk in user_ids:
+            loader.add(User(
+                pk=pk, username=f'user{pk}', password='!',
+                date_joined=now))
+        for pk in group_ids:
+            loader.add(Group(
+                pk=pk, title=f'Группа {pk}', slug=f'group-{pk}',
+                description=f'Описание группы {pk}'))
+        authors = rng.choices(
+            user_ids, cum_weights=popularity, k=posts) if users else []
+        for pk, author_id in zip(post_ids, authors):
+            loader.add(Post(
+                pk=pk, text=f'Пост {pk}: ' + ' '.join(
+                    rng.choice(WORDS) for _ in range(rng.randint(5, 40))),
+                pub_date=now - timedelta(seconds=rng.random() * year),
+                author_id=author_id,
+                group_id=rng.choice(group_ids) if group_ids else None))
+        for pk in range(first[Comment], first[Comment] + comments):
+            if not post_ids or not user_ids:
+                break
+            loader.add(Comment(
+                pk=pk, post_id=rng.choice(post_ids),
+                author_id=rng.choice(user_ids),
+                text=' '.join(rng.choice(WORDS) for _ in range(8)),
+                created=now))
+        pairs = set()
+        for _ in range(follows * 3):
+            if len(pairs) >= follows or users < 2:
+                break
+            user_id = rng.choice(user_ids)
+            author_id = rng.choices(user_ids, cum_weights=popularity)[0]
+            if user_id != author_id and (user_id, author_id) not in pairs:
+                pairs.add((user_id, author_id))
+                loader.add(Follow(
+                    pk=first[Follow] + len(pairs) - 1,
+                    user_id=user_id, author_id=author_id))
+    return loader.counts
@@ -0,0 +1,234 @@
+""" Вычисления с защитой от «набега» на кэш (cache stampede).
+
+Значение хранится вместе с длительностью вычисления и сроком
+годности. Незадолго до истечения срока один из процессов с
+вероятностью, растущей к концу срока, пересчитывает значение заранее
+(алгоритм XFetch), а остальные продолжают отдавать старое. При полном
+промахе пересчитывает только процесс, взявший блокировку.
+
+Блокировка - ``cache.add``. В Django 2.2 ``FileBasedCache.add``
+не атомарен (проверка и запись - отдельные шаги), поэтому с файловым
+кэшем блокировку изредка берут два процесса и оба пересчитывают
+значение: набег ослабляется, но не исключается. Атомарный ``add``
+есть у memcached. """
+import math
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, get_user_model
+from django.core.cache import cache
+from django.db.models import F
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                quote_etag)
+from django.utils.http import http_date
+
+from . import feed_cache, instrumentation, routers
+from .models import Group, UserStats
+from .paginators import (POSTS_PER_PAGE, CursorPage, CursorPaginator,
+                         is_numbered, paginate)
+
+FEED_PAGE_TIMEOUT = getattr(settings, 'FEED_PAGE_TIMEOUT', 60 * 10)
+USER_ID_TIMEOUT = getattr(settings, 'USER_ID_TIMEOUT', 60)
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 0.05
+LOCK_ATTEMPTS = 20
+BETA = 1.0
+
+
+def is_fresh(delta, expiry, beta=BETA):
+    """ XFetch: пора ли пересчитать значение заранее. """
+    return time.time() - delta * beta * math.log(random.random()) < expiry
+
+
+def get_or_compute(key, compute, timeout, beta=BETA):
+    """ Значение из кэша или результат compute() с защитой от набега. """
+    entry = cache.get(key)
+    instrumentation.record_cache(hit=entry is not None)
+    if entry is not None:
+        value, delta, expiry = entry
+        if is_fresh(delta, expiry, beta):
+            return value
+        if not cache.add(f'{key}:lock', 1, LOCK_TIMEOUT):
+            # Пересчётом уже занят другой процесс.
+            return value
+    elif not cache.add(f'{key}:lock', 1, LOCK_TIMEOUT):
+        for _ in range(LOCK_ATTEMPTS):
+            time.sleep(LOCK_WAIT)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        # Не дождались: считаем сами, чужую блокировку не трогаем.
+        return store(key, compute, timeout)
+    try:
+        return store(key, compute, timeout)
+    finally:
+        cache.delete(f'{key}:lock')
+
+
+def store(key, compute, timeout):
+    start = time.time()
+    value = compute()
+    delta = time.time() - start
+    timeout = routers.cache_timeout(feed_cache.timeout(timeout))
+    cache.set(key, (value, delta, time.time() + timeout), timeout)
+    return value
+
+
+def cached_feed_page(request, object_list, *feeds):
+    """ Страница ленты по курсору; объекты страницы кэшируются,
+    пока не изменится версия одной из лент feeds.
+
+    Нумерованные страницы не кэшируются. """
+    if is_numbered(request):
+        return paginate(request, object_list)
+    paginator = CursorPaginator(object_list, POSTS_PER_PAGE)
+    cursor = request.GET.get('cursor')
+
+    def compute():
+        page = paginator.get_page(cursor)
+        return list(page), page.next_cursor, page.previous_cursor
+
+    key = feed_cache.versioned_key('feed-page', feeds, cursor or '')
+    objects, next_cursor, previous_cursor = get_or_compute(
+        key, compute, FEED_PAGE_TIMEOUT)
+    return CursorPage(objects, paginator, next_cursor, previous_cursor)
+
+
+def cached_user_stats(user):
+    """ Счётчики пользователя, кэшируемые до их изменения. """
+    key = feed_cache.versioned_key('user-stats', [f'stats:{user.pk}'])
+    return get_or_compute(
+        key, lambda: UserStats.for_user(user), FEED_PAGE_TIMEOUT)
+
+
+# Список групп в памяти процесса: версия ленты groups -> пары.
+# Сигнал изменения группы очищает его сразу, а другие процессы
+# замечают новую версию в общем кэше.
+_group_choices = {}
+
+
+def cached_group_choices():
+    """ Пары (id, название) всех групп для выбора в форме поста.
+
+    Хранятся в памяти процесса и в общем кэше до изменения
+    списка групп; на каждый вызов - одно чтение версии из кэша. """
+    version, = feed_cache.feed_versions('groups')
+    choices = _group_choices.get(version)
+    if choices is None:
+        key = feed_cache.versioned_key('group-choices', ['groups'])
+        choices = get_or_compute(
+            key,
+            # групп немного: сортируем в Python, индекс по title не нужен
+            lambda: sorted(
+                Group.objects.values_list('pk', 'title'),
+                key=lambda choice: choice[1]),
+            feed_cache.FEED_CACHE_TIMEOUT)
+        _group_choices.clear()
+        _group_choices[version] = choices
+    return choices
+
+
+def forget_group_choices():
+    _group_choices.clear()
+
+
+def cached_group_directory():
+    """ Группы со счётчиками, недавно активные первыми. """
+    key = feed_cache.versioned_key(
+        'group-directory', ['groups', 'group-stats'])
+    return get_or_compute(
+        key,
+        lambda: list(Group.objects.order_by(
+            F('last_post_at').desc(nulls_last=True), 'title')),
+        FEED_PAGE_TIMEOUT)
+
+
+def user_id_key(username):
+    return f'user-id:{username}'
+
+
+def forget_user_id(username):
+    cache.delete(user_id_key(username))
+
+
+def cached_user_id(username):
+    """ id пользователя по username или None.
+
+    Кэшируется ненадолго, в том числе отсутствие пользователя (0);
+    сохранение пользователя сбрасывает ключ его имени, а после
+    переименования resolve_user сам сверит имя. """
+    key = user_id_key(username)
+    user_id = cache.get(key)
+    if user_id is None:
+        user_id = get_user_model().objects.filter(
+            username=username).values_list('pk', flat=True).first() or 0
+        cache.set(key, user_id, routers.cache_timeout(USER_ID_TIMEOUT))
+    return user_id or None
+
+
+def resolve_user(request, username):
+    """ Пользователь по username или None - не больше одного
+    запроса к базе за HTTP-запрос.
+
+    Найденные пользователи запоминаются в request, текущий
+    пользователь берётся из request.user без запроса. """
+    resolved = request.__dict__.setdefault('resolved_users', {})
+    if username in resolved:
+        return resolved[username]
+    if request.user.is_authenticated and request.user.username == username:
+        user = request.user
+    else:
+        users = get_user_model().objects
+        user_id = cached_user_id(username)
+        user = None if user_id is None else users.filter(pk=user_id).first()
+        if user_id is not None and (user is None
+                                    or user.username != username):
+            # Пользователя переименовали или удалили после
+            # того, как его id попал в кэш.
+            forget_user_id(username)
+            user = users.filter(username=username).first()
+    resolved[username] = user
+    return user
+
+
+def conditional_page(get_feeds):
+    """ ETag и Last-Modified страницы из версий лент.
+
+    get_feeds(request, *args, **kwargs) возвращает ленты, от которых
+    зависит страница, или None, если страницы нет. Версии и время
+    изменения лент лежат в кэше, поэтому ответ 304 обходится без
+    запросов к списку постов и без рендеринга шаблона. """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            feeds = get_feeds(request, *args, **kwargs)
+            if feeds is None:
+                return view(request, *args, **kwargs)
+            # Страница зависит от пользователя: имя в меню,
+            # ссылки на редактирование, кнопка подписки. Id берётся
+            # из сессии, чтобы не загружать самого пользователя.
+            user_id = request.session.get(SESSION_KEY)
+            etag = quote_etag(feed_cache.versioned_key(
+                'page', feeds, request.get_full_path(), user_id))
+            modified = feed_cache.last_modified(*feeds)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                # Страница с реплики может отставать от версий лент.
+                if response.status_code == 304 or (
+                        not routers.reading_replica()):
+                    response['ETag'] = etag
+                    if modified is not None:
+                        response['Last-Modified'] = http_date(modified)
+                patch_cache_control(
+                    response, no_cache=True,
+                    private=user_id is not None)
+            return response
+        return wrapper
+    return decorator
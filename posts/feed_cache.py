@@ -0,0 +1,125 @@
+""" Кэш фрагментов лент с версиями.
+
+Ключ фрагмента строится из версий лент, от которых зависит страница,
+курсора (или номера) страницы и пользователя. Версия ленты
+увеличивается сигналами при изменении постов, комментариев и подписок,
+поэтому фрагменты могут жить часами и не устаревать. """
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import instrumentation
+
+FEED_CACHE_TIMEOUT = getattr(settings, 'FEED_CACHE_TIMEOUT', 60 * 60 * 3)
+CACHE_SHARED = getattr(settings, 'CACHE_SHARED', True)
+LOCAL_CACHE_TIMEOUT = getattr(settings, 'LOCAL_CACHE_TIMEOUT', 60)
+HITS_KEY = 'feed-cache:hits'
+MISSES_KEY = 'feed-cache:misses'
+
+
+def timeout(seconds):
+    """ Срок хранения в кэше.
+
+    Кэш отдельного процесса (locmem) не видит, как другие воркеры
+    увеличивают версии лент, поэтому версии и всё, что по ним
+    закэшировано, живут в нём не дольше ``LOCAL_CACHE_TIMEOUT``:
+    после этого версия начинается заново и меняет ключи и ETag. """
+    if CACHE_SHARED:
+        return seconds
+    if seconds is None:
+        return LOCAL_CACHE_TIMEOUT
+    return min(seconds, LOCAL_CACHE_TIMEOUT)
+
+
+def version_key(feed):
+    return f'feed-version:{feed}'
+
+
+def initial_version():
+    # Если ключ версии вытеснен из кэша, новая версия не должна
+    # совпасть со старой, иначе всплывут устаревшие фрагменты.
+    return int(time.time() * 1000)
+
+
+def feed_versions(*feeds):
+    """ Текущие версии лент одним запросом к кэшу. """
+    keys = [version_key(feed) for feed in feeds]
+    versions = cache.get_many(keys)
+    missing = {key: initial_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout(None))
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def modified_key(feed):
+    return f'feed-modified:{feed}'
+
+
+def bump(*feeds):
+    """ Инвалидирует все закэшированные страницы лент. """
+    for feed in feeds:
+        try:
+            cache.incr(version_key(feed))
+        except ValueError:
+            cache.set(version_key(feed), initial_version(), timeout(None))
+    cache.set_many(
+        {modified_key(feed): int(time.time()) for feed in feeds},
+        timeout(None))
+
+
+def last_modified(*feeds):
+    """ Время последнего изменения лент или None, если ни одна
+    из них не менялась с очистки кэша. """
+    times = cache.get_many([modified_key(feed) for feed in feeds])
+    return max(times.values(), default=None)
+
+
+def post_feeds(post, previous_group_id=None):
+    """ Ленты, в которых показывается пост. """
+    feeds = ['index', f'profile:{post.author_id}']
+    for group_id in {post.group_id, previous_group_id} - {None}:
+        feeds.append(f'group:{group_id}')
+    return feeds
+
+
+def versioned_key(prefix, feeds, *parts):
+    """ Ключ, меняющийся при изменении любой из лент feeds. """
+    versions = feed_versions(*feeds)
+    parts = [
+        f'{feed}={version}' for feed, version in zip(feeds, versions)
+    ] + [str(part) for part in parts]
+    digest = hashlib.md5(':'.join(parts).encode()).hexdigest()
+    return f'{prefix}:{digest}'
+
+
+def page_token(request):
+    return request.GET.get('cursor') or request.GET.get('page', '')
+
+
+def feed_cache_key(request, *feeds):
+    """ Ключ фрагмента текущей страницы ленты для пользователя. """
+    # В ленте есть ссылки «Редактировать» только для автора поста.
+    return versioned_key(
+        'feed-fragment', feeds, page_token(request), request.user.pk)
+
+
+def record(hit):
+    """ Учитывает попадание или промах кэша фрагментов. """
+    instrumentation.record_cache(hit)
+    key = HITS_KEY if hit else MISSES_KEY
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def stats():
+    """ Счётчики попаданий и промахов кэша фрагментов. """
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {
+        'hits': counters.get(HITS_KEY, 0),
+        'misses': counters.get(MISSES_KEY, 0),
+    }
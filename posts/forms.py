@@ -1,6 +1,14 @@
-from django.forms import ModelForm, Select, Textarea
+from functools import partial
 
-from .models import Comment, Group, Post
+from django.forms import ModelForm, Textarea
+
+from . import uploads
+from .caching import cached_group_choices
+from .models import Comment, Post
+
+
+def group_choices(empty_label):
+    return [('', empty_label)] + cached_group_choices()
 
 
 class PostForm(ModelForm):
@@ -9,9 +17,35 @@ class PostForm(ModelForm):
 
         model = Post
         fields = ('text', 'group', 'image')
-        widgets = {
-            'group': Select(choices=Group.objects.all()),
-        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Список групп для выбора берётся из кэша при отрисовке,
+        # а не из базы: queryset поля нужен только для проверки
+        # присланного id.
+        group = self.fields['group']
+        group.choices = partial(group_choices, group.empty_label)
+        # Слишком большой файл не отдаём Pillow вовсе,
+        # ошибку покажем в clean().
+        self.oversized_image = None
+        image = self.files.get('image')
+        if image is not None and uploads.is_oversized(image):
+            self.oversized_image = image
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Атрибут image есть только у только что загруженного файла.
+        if image and hasattr(image, 'image'):
+            return uploads.reencode(image)
+        return image
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.oversized_image is not None:
+            self.add_error('image', uploads.size_error())
+        return cleaned_data
 
 
 class CommentForm(ModelForm):
@@ -0,0 +1,208 @@
+""" Замеры запросов: время ответа, число и время SQL-запросов,
+время рендеринга шаблонов, попадания и промахи кэша.
+
+Замеряется доля запросов PERF_SAMPLE_RATE (по умолчанию ни одного):
+у незамеренного запроса вся цена - одно случайное число. По каждому
+замеренному запросу пишется JSON-строка в лог ``posts.instrumentation``,
+а суммы по представлениям отдаются в текстовом формате Prometheus
+на /metrics/. Запрос, сделавший больше PERF_QUERY_BUDGET SQL-запросов,
+пишется в лог как предупреждение.
+
+Суммы хранятся в памяти процесса: у каждого воркера свои. """
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+PERF_SAMPLE_RATE = getattr(settings, 'PERF_SAMPLE_RATE', 0.0)
+PERF_QUERY_BUDGET = getattr(settings, 'PERF_QUERY_BUDGET', 20)
+
+# Метрика Prometheus и поле RequestMetrics, из которого она берётся.
+METRICS = (
+    ('yatube_requests_total', 'counter', 'requests',
+     'Замеренные запросы.'),
+    ('yatube_request_seconds_total', 'counter', 'wall_time',
+     'Полное время ответа.'),
+    ('yatube_db_queries_total', 'counter', 'queries',
+     'SQL-запросы.'),
+    ('yatube_db_seconds_total', 'counter', 'db_time',
+     'Время SQL-запросов.'),
+    ('yatube_template_seconds_total', 'counter', 'template_time',
+     'Время рендеринга шаблонов.'),
+    ('yatube_cache_hits_total', 'counter', 'cache_hits',
+     'Попадания кэша.'),
+    ('yatube_cache_misses_total', 'counter', 'cache_misses',
+     'Промахи кэша.'),
+    ('yatube_query_budget_exceeded_total', 'counter', 'over_budget',
+     'Запросы, сделавшие больше PERF_QUERY_BUDGET SQL-запросов.'),
+)
+
+_current = ContextVar('request_metrics', default=None)
+_totals = {}
+_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """ Замеры одного запроса. Сам служит обёрткой выполнения
+    SQL для ``connection.execute_wrapper``. """
+
+    def __init__(self):
+        self.requests = 1
+        self.wall_time = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.over_budget = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+def record_cache(hit):
+    """ Учитывает обращение к кэшу в замеряемом запросе. """
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+def instrument_templates():
+    """ Подменяет рендеринг шаблонов бэкенда Django на замеряемый.
+
+    Бэкенд вызывается только для шаблона страницы целиком,
+    include внутри него считаются в его времени. """
+    from django.template.backends.django import Template
+    original = Template.render
+    if getattr(original, 'instrumented', False):
+        return
+
+    @wraps(original)
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return original(self, context, request)
+        start = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+    render.instrumented = True
+    Template.render = render
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name
+
+
+def add_to_totals(view, metrics):
+    with _lock:
+        totals = _totals.get(view)
+        if totals is None:
+            _totals[view] = metrics
+            return
+        for _, _, field, _ in METRICS:
+            setattr(totals, field,
+                    getattr(totals, field) + getattr(metrics, field))
+
+
+def reset():
+    with _lock:
+        _totals.clear()
+
+
+class InstrumentationMiddleware:
+    """ Замеряет долю запросов PERF_SAMPLE_RATE. Ставится первой
+    в MIDDLEWARE, чтобы замер включал остальные middleware. """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument_templates()
+
+    def __call__(self, request):
+        if random.random() >= PERF_SAMPLE_RATE:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            metrics.wall_time = time.perf_counter() - start
+            _current.reset(token)
+        self.report(request, response, metrics)
+        return response
+
+    def report(self, request, response, metrics):
+        view = view_name(request)
+        metrics.over_budget = int(metrics.queries > PERF_QUERY_BUDGET)
+        add_to_totals(view, metrics)
+        line = json.dumps({
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': round(metrics.wall_time * 1000, 2),
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'template_ms': round(metrics.template_time * 1000, 2),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+            'over_budget': bool(metrics.over_budget),
+        }, ensure_ascii=False)
+        if metrics.over_budget:
+            logger.warning(line)
+        else:
+            logger.info(line)
+
+
+def render_metrics():
+    """ Суммы по представлениям в текстовом формате Prometheus. """
+    with _lock:
+        totals = sorted(_totals.items())
+        lines = []
+        for name, kind, field, help_text in METRICS:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for view, metrics in totals:
+                lines.append(
+                    f'{name}{{view="{view}"}} {getattr(metrics, field)}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """ /metrics/ для сборщика Prometheus: с адресов INTERNAL_IPS
+    или для сотрудников. """
+    internal = request.META.get('REMOTE_ADDR') in getattr(
+        settings, 'INTERNAL_IPS', ())
+    if not internal and not request.user.is_staff:
+        raise Http404
+    return HttpResponse(
+        render_metrics(), content_type='text/plain; version=0.0.4')
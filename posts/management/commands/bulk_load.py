@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        'Быстро загружает дамп dumpdata (JSON, можно .gz) пачками '
+        'bulk_create или создаёт синтетические данные (--generate).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fixture', nargs='?',
+            help='Файл дампа; не нужен вместе с --generate.')
+        parser.add_argument(
+            '--batch-size', type=int, default=bulk.BATCH_SIZE,
+            help='Объектов одной модели в пачке и в транзакции.')
+        parser.add_argument(
+            '--defer-indexes', action='store_true',
+            help='Удалить индексы на время загрузки (только SQLite).')
+        parser.add_argument(
+            '--generate', action='store_true',
+            help='Создать синтетические данные вместо загрузки дампа.')
+        for name, default in (('users', 1000), ('groups', 20),
+                              ('posts', 100000), ('comments', 200000),
+                              ('follows', 20000)):
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Сколько создать (по умолчанию {default}).')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, fixture=None, generate=False, batch_size,
+               defer_indexes, **options):
+        start = time.perf_counter()
+        if generate:
+            counts = bulk.generate(
+                options['users'], options['groups'], options['posts'],
+                options['comments'], options['follows'],
+                seed=options['seed'], batch_size=batch_size,
+                defer_indexes=defer_indexes)
+            skipped = 0
+        elif fixture:
+            counts, skipped = bulk.load_fixture(
+                fixture, batch_size, defer_indexes)
+        else:
+            raise CommandError('Укажите файл дампа или --generate.')
+        loaded = ', '.join(
+            f'{model._meta.verbose_name} - {count}'
+            for model, count in counts.items())
+        self.stdout.write(
+            f'Загружено: {loaded}. Пропущено: {skipped}. '
+            f'Время: {time.perf_counter() - start:.1f} с.')
@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+# Признаки плохого плана в выводе EXPLAIN: полный просмотр таблицы
+# и сортировка во временном B-дереве. Ключ - connection.vendor.
+PROBLEMS = {
+    'sqlite': ('SCAN ', 'USE TEMP B-TREE'),
+    'postgresql': ('Seq Scan', 'Sort'),
+}
+# Строки SCAN, которые не означают полного просмотра таблицы.
+HARMLESS = ('USING INDEX', 'USING COVERING INDEX', 'USING INTEGER PRIMARY',
+            'VIRTUAL TABLE', 'CONSTANT ROW', 'SUBQUERY')
+# Кэш выключается, чтобы страницы выполнили все свои запросы,
+# не трогая кэш работающего сайта.
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class QueryCollector:
+    """ Обёртка выполнения SQL, запоминающая SELECT-запросы. """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            if (sql, params) not in self.queries:
+                self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Запрашивает основные страницы, выполняет EXPLAIN для каждого '
+        'их SELECT и сообщает о полных просмотрах таблиц и сортировках '
+        'во временных B-деревьях.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Завершиться с ошибкой, если найдены проблемы.')
+
+    def handle(self, *args, fail=False, verbosity=1, **options):
+        markers = PROBLEMS.get(connection.vendor)
+        if markers is None:
+            raise CommandError(
+                f'Разбор планов для {connection.vendor} не поддерживается.')
+        found = 0
+        with override_settings(CACHES=NO_CACHE):
+            for name, url, user in self.pages():
+                queries = self.collect(url, user)
+                self.stdout.write(f'{name} {url}: запросов {len(queries)}')
+                for sql, params in queries:
+                    plan = self.explain(sql, params)
+                    problems = [
+                        line for line in plan
+                        if any(marker in line for marker in markers)
+                        and not any(ok in line for ok in HARMLESS)]
+                    found += len(problems)
+                    for line in problems:
+                        self.stdout.write(f'  {line}\n    {sql}')
+                    if verbosity > 1 and not problems:
+                        self.stdout.write(
+                            '  ' + '; '.join(plan) + f'\n    {sql}')
+        self.stdout.write(f'Найдено проблем: {found}.')
+        if fail and found:
+            raise CommandError('В планах запросов есть полные просмотры '
+                               'или сортировки.')
+
+    def pages(self):
+        """ Тройки (имя, адрес, пользователь) страниц для проверки
+        на примерах из базы: последний пост, его автор и группа,
+        первый подписчик. """
+        pages = [('index', reverse('index'), None)]
+        group = Group.objects.order_by('pk').first()
+        if group is not None:
+            pages.append(
+                ('group', reverse('group', args=[group.slug]), None))
+        post = Post.objects.select_related('author').order_by('-pk').first()
+        if post is not None:
+            author = post.author
+            args = [author.username, post.pk]
+            pages += [
+                ('profile', reverse('profile', args=[author.username]),
+                 None),
+                ('post', reverse('post', args=args), None),
+                ('post_edit', reverse('post_edit', args=args), author),
+            ]
+        reader_id = Follow.objects.values_list('user_id', flat=True).first()
+        if reader_id is not None:
+            pages.append((
+                'follow_index', reverse('follow_index'),
+                User.objects.get(pk=reader_id)))
+        return pages
+
+    @staticmethod
+    def collect(url, user):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        collector = QueryCollector()
+        try:
+            with connection.execute_wrapper(collector):
+                client.get(url)
+        finally:
+            client.logout()
+        return collector.queries
+
+    @staticmethod
+    def explain(sql, params):
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            # SQLite отдаёт (id, parent, notused, detail),
+            # PostgreSQL - по строке плана в первом столбце.
+            return [str(row[-1]) for row in cursor.fetchall()]
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed_cache
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша фрагментов лент.'
+
+    def handle(self, *args, **options):
+        stats = feed_cache.stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, "
+            f"доля попаданий: {ratio:.1%}")
@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import feed_cache, timeline
+from posts.models import Comment, Group, Post, UserStats
+from posts.stats import USER_COUNTERS, count_related, last_post_date
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не меняя.')
+
+    def handle(self, *args, dry_run=False, **options):
+        # Ленты, чьи закэшированные страницы показывают исправленные
+        # счётчики; сбрасываются после коммита.
+        self.feeds = set()
+        with transaction.atomic():
+            fixed_posts = self.reconcile_posts()
+            fixed_users = self.reconcile_users()
+            fixed_groups = self.reconcile_groups()
+            if dry_run:
+                transaction.set_rollback(True)
+        if self.feeds and not dry_run:
+            feed_cache.bump(*sorted(self.feeds))
+        verb = 'Найдено расхождений' if dry_run else 'Исправлено'
+        self.stdout.write(
+            f'{verb}: постов - {fixed_posts}, '
+            f'пользователей - {fixed_users}, групп - {fixed_groups}.')
+
+    def reconcile_posts(self):
+        fixed = 0
+        posts = Post.objects.annotate(
+            real_count=count_related(Comment, 'post')
+        ).only('pk', 'comment_count', 'author_id', 'group_id')
+        for post in posts.iterator():
+            if post.comment_count != post.real_count:
+                fixed += 1
+                self.feeds.update(feed_cache.post_feeds(post))
+                Post.objects.filter(pk=post.pk).update(
+                    comment_count=post.real_count)
+        return fixed
+
+    def reconcile_users(self):
+        fixed = 0
+        users = get_user_model().objects.annotate(**{
+            f'real_{name}': count_related(model, field)
+            for name, (model, field) in USER_COUNTERS.items()
+        }).select_related('stats')
+        for user in users.iterator():
+            real = {
+                name: getattr(user, f'real_{name}')
+                for name in USER_COUNTERS}
+            stats = getattr(user, 'stats', None)
+            if stats is None:
+                UserStats.objects.create(user=user, **real)
+                fixed += 1
+                self.feeds.add(f'stats:{user.pk}')
+            elif any(getattr(stats, name) != real[name] for name in real):
+                UserStats.objects.filter(pk=stats.pk).update(**real)
+                fixed += 1
+                self.feeds.add(f'stats:{user.pk}')
+                if (real['followers_count'] <= timeline.TIMELINE_FANOUT_LIMIT
+                        < stats.followers_count):
+                    # Автор снова раскладывается по лентам.
+                    timeline.rebuild(user.pk)
+        return fixed
+
+    def reconcile_groups(self):
+        fixed = 0
+        groups = Group.objects.annotate(
+            real_count=count_related(Post, 'group'),
+            real_last=last_post_date(),
+        ).only('pk', 'posts_count', 'last_post_at')
+        for group in groups.iterator():
+            if (group.posts_count, group.last_post_at) != (
+                    group.real_count, group.real_last):
+                fixed += 1
+                Group.objects.filter(pk=group.pk).update(
+                    posts_count=group.real_count,
+                    last_post_at=group.real_last)
+                self.feeds.update(('groups', 'group-stats'))
+        return fixed
@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import feed_cache
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails, save_variants
+
+
+def warm(image_name):
+    """ Создаёт миниатюры в дочернем процессе; имена копий
+    записывает в посты родительский процесс. """
+    try:
+        names = generate_thumbnails(image_name)
+    except Exception as error:
+        return image_name, None, str(error)
+    finally:
+        connections.close_all()
+    return image_name, names, None
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для всех картинок постов параллельно.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Количество процессов (по умолчанию - по числу ядер).')
+
+    def handle(self, *args, workers, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None)
+        names = list(
+            posts.order_by().values_list('image', flat=True).distinct())
+        if workers > 1:
+            # Дочерние процессы не должны унаследовать соединение с базой.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=get_context('fork')) as executor:
+                results = list(executor.map(warm, names, chunksize=16))
+        else:
+            results = [warm(name) for name in names]
+        for name, variants, error in results:
+            if not error:
+                save_variants(name, variants)
+        failed = [(name, error) for name, _, error in results if error]
+        for name, error in failed:
+            self.stderr.write(f'{name}: {error}')
+
+        # Страницы с заглушками лежат в кэше лент - сбрасываем их.
+        feeds = {'index'}
+        for author_id, group_id in posts.values_list('author_id', 'group_id'):
+            feeds.add(f'profile:{author_id}')
+            if group_id is not None:
+                feeds.add(f'group:{group_id}')
+        feed_cache.bump(*feeds)
+        self.stdout.write(
+            f'Обработано картинок: {len(names) - len(failed)}, '
+            f'ошибок: {len(failed)}.')
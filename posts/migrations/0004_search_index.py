@@ -0,0 +1,34 @@
+from django.db import migrations
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def create_index(apps, schema_editor):
+    # Индекс FTS5 есть только в SQLite, для других баз
+    # используется бэкенд поиска без отдельной таблицы.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        "text, comments, tokenize = 'unicode61 remove_diacritics 2')")
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, text, comments) "
+        "SELECT p.id, p.text, COALESCE(("
+        "SELECT group_concat(c.text, char(10)) FROM posts_comment c "
+        "WHERE c.post_id = p.id), '') FROM posts_post p")
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_timeline'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.6 on 2026-10-18 22:05
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_group_stats(apps, schema_editor):
+    """ Заполняет счётчики групп для уже существующих постов. """
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.filter(group=models.OuterRef('pk')).order_by()
+    Group.objects.update(
+        posts_count=Coalesce(models.Subquery(
+            posts.values('group').annotate(
+                count=models.Count('pk')).values('count'),
+            output_field=models.IntegerField()), 0),
+        last_post_at=models.Subquery(
+            posts.order_by('-pub_date').values('pub_date')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_comment_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='last_post_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Последний пост'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество постов'),
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+FTS_TABLE = 'posts_post_fts'
+INSERT = f'INSERT INTO {FTS_TABLE} (rowid, text, comments, post_id)'
+
+
+def split_comments(apps, schema_editor):
+    # Вместо строки на пост со склеенными комментариями - отдельные
+    # строки поста (rowid = id) и комментариев (rowid = -id).
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        "text, comments, post_id UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2')")
+    schema_editor.execute(
+        f"{INSERT} SELECT id, text, '', id FROM posts_post")
+    schema_editor.execute(
+        f"{INSERT} SELECT -id, '', text, post_id FROM posts_comment")
+
+
+def join_comments(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        "text, comments, tokenize = 'unicode61 remove_diacritics 2')")
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, text, comments) "
+        "SELECT p.id, p.text, COALESCE(("
+        "SELECT group_concat(c.text, char(10)) FROM posts_comment c "
+        "WHERE c.post_id = p.id), '') FROM posts_post p")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_comment_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_comments, join_comments),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 22:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_comment_search_rows'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_variants',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Миниатюры картинки'),
+        ),
+    ]
@@ -7,6 +7,16 @@ class Group(models.Model):
     title = models.CharField('Заголовок', max_length=200)
     slug = models.SlugField('Идентификатор', unique=True)
     description = models.TextField('Описание')
+    # счётчик постов и время последнего поста, поддерживаются сигналами
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False)
+    last_post_at = models.DateTimeField(
+        'Последний пост',
+        blank=True,
+        null=True,
+        editable=False)
 
     def __str__(self):
         return f"{self.title}"
@@ -17,6 +27,13 @@ class Group(models.Model):
         verbose_name = 'Group'
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """ Посты для ленты: автор и группа одним JOIN,
+        количество комментариев - в поле ``comment_count``. """
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     """ Модель поста. """
     text = models.TextField(
@@ -26,26 +43,53 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True,
         db_index=True)
+    # отдельные индексы внешних ключей не нужны:
+    # их заменяют составные индексы лент в Meta
     author = models.ForeignKey(
         get_user_model(),
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор')
+        verbose_name='Автор',
+        db_index=False)
     group = models.ForeignKey(
         Group,
         on_delete=models.SET_NULL,
+        db_index=False,
         blank=True,
         null=True,
         verbose_name='Группа',
         help_text='Выберите группу!')
     # поле для картинки
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # счётчик комментариев, поддерживается сигналами
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False)
+    # имена готовых миниатюр картинки (JSON, см. posts.thumbnails)
+    thumbnail_variants = models.TextField(
+        'Миниатюры картинки',
+        blank=True,
+        default='',
+        editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         """ Мета-класс поста,
         описывающий 'нормальное' название и сортировку. """
         verbose_name = 'Post'
         ordering = ('-pub_date',)
+        # ленты автора и группы: фильтр и сортировка одним индексом;
+        # id - в том же порядке, что и в курсоре паджинатора
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -56,7 +100,8 @@ class Comment(models.Model):
         Post,
         on_delete=models.CASCADE,
         related_name='comments',
-        verbose_name='Пост')
+        verbose_name='Пост',
+        db_index=False)
     author = models.ForeignKey(
         get_user_model(),
         on_delete=models.CASCADE,
@@ -67,12 +112,22 @@ class Comment(models.Model):
         verbose_name='Содержание комментария',
         help_text='Напишите что-нибудь!')
     created = models.DateTimeField('Дата публикации', auto_now_add=True)
+    # Ключ из формы: повторная отправка той же формы
+    # не создаёт второй комментарий.
+    idempotency_key = models.UUIDField(
+        null=True, blank=True, unique=True, editable=False)
 
     class Meta:
         """ Мета-класс поста,
         описывающий 'нормальное' название и сортировку. """
         verbose_name = 'Comment'
         ordering = ('-created',)
+        indexes = [
+            # порядок курсора комментариев на странице поста
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -87,8 +142,69 @@ class Follow(models.Model):
     author = models.ForeignKey(
         get_user_model(),
         on_delete=models.CASCADE,
-        related_name='following'
+        related_name='following',
+        db_index=False
     )
 
     class Meta:
+        # (user, author) индексирует уникальность,
+        # (author, user) - поиск подписчиков автора
         unique_together = 'user', 'author'
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """ Запись материализованной ленты подписок.
+
+    Создаётся для каждого подписчика при публикации поста
+    (fan-out on write), см. ``posts.timeline``. """
+    user = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост')
+    # копия Post.pub_date, чтобы лента читалась одним индексом
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Timeline entry'
+        unique_together = 'user', 'post'
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='timeline_user_pub_date_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """ Счётчики пользователя: посты, подписчики и подписки.
+
+    Обновляются сигналами атомарно через F(),
+    сверяются командой ``recount_stats``. """
+    user = models.OneToOneField(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Пользователь')
+    posts_count = models.PositiveIntegerField('Записей', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'User stats'
+
+    def __str__(self):
+        return f"{self.user}"
+
+    @classmethod
+    def for_user(cls, user):
+        """ Счётчики пользователя; строка создаётся при первом обращении. """
+        return cls.objects.get_or_create(user=user)[0]
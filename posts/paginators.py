@@ -0,0 +1,126 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = getattr(settings, 'COMMENTS_PER_PAGE', 20)
+
+
+class CursorPage(Page):
+    """ Страница ленты, полученная по курсору.
+
+    Номера страницы и общего количества записей у неё нет:
+    навигация идёт только по ссылкам на соседние страницы. """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} objects>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """ Паджинатор по ключу (field, pk) вместо OFFSET.
+
+    Каждая страница - это один запрос
+    ``WHERE (field, pk) < (значение, id) ORDER BY field DESC, pk DESC
+    LIMIT per_page + 1``, поэтому её стоимость не зависит от глубины
+    и от размера таблицы, а COUNT(*) не выполняется вовсе. """
+
+    def __init__(self, object_list, per_page, field='pub_date'):
+        self.field = field
+        super().__init__(
+            object_list.order_by(f'-{field}', '-pk'), per_page)
+
+    def encode_cursor(self, obj, reverse=False):
+        value = getattr(obj, self.field).isoformat()
+        raw = f"{'p' if reverse else 'n'}|{value}|{obj.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """ Возвращает (reverse, значение поля, pk) или None,
+        если курсор испорчен. """
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            direction, value, pk = raw.split('|')
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            return None
+        if direction not in ('n', 'p') or value is None:
+            return None
+        return direction == 'p', value, pk
+
+    def get_page(self, cursor):
+        """ Страница по курсору; пустой или испорченный курсор
+        дает первую страницу, как и ``Paginator.get_page``. """
+        position = self.decode_cursor(cursor) if cursor else None
+        if position is None:
+            return self._build_page(self.object_list, reverse=False,
+                                    has_before=False)
+        reverse, value, pk = position
+        if reverse:
+            object_list = self.object_list.filter(
+                Q(**{f'{self.field}__gt': value})
+                | Q(**{self.field: value, 'pk__gt': pk})
+            ).order_by(self.field, 'pk')
+        else:
+            object_list = self.object_list.filter(
+                Q(**{f'{self.field}__lt': value})
+                | Q(**{self.field: value, 'pk__lt': pk})
+            )
+        return self._build_page(object_list, reverse=reverse,
+                                has_before=True)
+
+    def _build_page(self, object_list, reverse, has_before):
+        # Берём на одну запись больше, чтобы узнать,
+        # есть ли что-то дальше в направлении обхода.
+        objects = list(object_list[:self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if reverse:
+            objects.reverse()
+            has_next, has_previous = has_before, has_more
+        else:
+            has_next, has_previous = has_more, has_before
+        next_cursor = previous_cursor = None
+        if objects and has_next:
+            next_cursor = self.encode_cursor(objects[-1])
+        if objects and has_previous:
+            previous_cursor = self.encode_cursor(objects[0], reverse=True)
+        return CursorPage(objects, self, next_cursor, previous_cursor)
+
+
+def is_numbered(request, numbered=False):
+    """ Нужны ли нумерованные страницы вместо курсора. """
+    return (
+        numbered
+        or getattr(settings, 'POSTS_NUMBERED_PAGINATION', False)
+        or 'page' in request.GET)
+
+
+def paginate(request, object_list, numbered=False):
+    """ Страница ленты для запроса.
+
+    По умолчанию используется паджинация по курсору (``?cursor=``).
+    Нумерованные страницы включаются параметром ``numbered``,
+    настройкой ``POSTS_NUMBERED_PAGINATION`` или явным ``?page=``. """
+    if is_numbered(request, numbered):
+        paginator = Paginator(object_list, POSTS_PER_PAGE)
+        return paginator.get_page(request.GET.get('page'))
+    paginator = CursorPaginator(object_list, POSTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('cursor'))
@@ -0,0 +1,148 @@
+""" Чтение лент и профилей с реплики базы.
+
+Если в ``DATABASES`` есть реплика (``REPLICA_DB``), представления
+с декоратором ``read_from_replica`` читают с неё, всё остальное
+читается и пишется в основную базу. Сессия и пользователь запроса
+загружаются из основной базы до перехода на реплику.
+
+Реплика отстаёт от основной базы, поэтому после записи (POST в
+представление с ``write_to_primary`` или ``db_for_write`` вне
+представлений чтения, например при входе) браузер получает cookie
+``STICKY_COOKIE``: ``REPLICA_STICKY_SECONDS`` секунд его запросы
+читают из основной базы и видят свои изменения.
+
+Всё, что прочитано с реплики, попадает в кэш не дольше, чем на
+``REPLICA_MAX_LAG`` секунд, и страница с реплики не получает ETag:
+реплика может ещё не содержать строк, из-за которых версия ленты
+уже выросла, а ключи кэша и ETag строятся из версий.
+
+Репликацию router не выполняет: для SQLite реплика - копия файла
+основной базы, которую обновляет внешний процесс. """
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB = getattr(settings, 'REPLICA_DB', 'replica')
+REPLICA_STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+REPLICA_MAX_LAG = getattr(settings, 'REPLICA_MAX_LAG', 5)
+STICKY_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_current = ContextVar('replica_routing', default=None)
+
+
+class RequestRouting:
+    """ Маршрутизация одного запроса. """
+
+    def __init__(self, sticky):
+        self.sticky = sticky
+        self.replica = False
+        self.wrote = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _current.get()
+        if routing is not None and routing.replica:
+            return REPLICA_DB
+        return None
+
+    def db_for_write(self, model, **hints):
+        routing = _current.get()
+        # get_or_create спрашивает базу для записи и тогда, когда
+        # строка уже есть, поэтому в представлениях чтения окно
+        # основной базы не открывается.
+        if routing is not None and not routing.replica:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия основной базы: объекты из обеих связаны.
+        return True
+
+
+def reading_replica():
+    routing = _current.get()
+    return routing is not None and routing.replica
+
+
+def cache_timeout(timeout):
+    """ Срок в кэше для данных текущего запроса. """
+    if reading_replica():
+        return min(timeout, REPLICA_MAX_LAG)
+    return timeout
+
+
+def has_replica():
+    replica = connections.databases.get(REPLICA_DB)
+    # Реплика-зеркало (так её настраивают тесты) - та же база.
+    return replica is not None and (
+        replica['NAME'] != connections.databases[DEFAULT_DB_ALIAS]['NAME'])
+
+
+def is_sticky(request):
+    try:
+        return float(request.COOKIES[STICKY_COOKIE]) > time.time()
+    except (KeyError, ValueError):
+        return False
+
+
+class ReplicaMiddleware:
+    """ Заводит маршрутизацию на время запроса и после записи
+    оставляет браузер на основной базе. """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routing = RequestRouting(is_sticky(request))
+        token = _current.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        if routing.wrote:
+            response.set_cookie(
+                STICKY_COOKIE, str(time.time() + REPLICA_STICKY_SECONDS),
+                max_age=REPLICA_STICKY_SECONDS, httponly=True)
+        return response
+
+
+def read_from_replica(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        routing = _current.get()
+        if routing is None or routing.sticky or not has_replica():
+            return view(request, *args, **kwargs)
+        # Сессия и пользователь - из основной базы: только что
+        # зарегистрированного пользователя на реплике может не быть.
+        request.user.is_authenticated
+        routing.replica = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            routing.replica = False
+    return wrapper
+
+
+def mark_written():
+    """ Открывает окно основной базы для браузера текущего запроса. """
+    routing = _current.get()
+    if routing is not None:
+        routing.wrote = True
+
+
+def write_to_primary(view):
+    """ Представление пишет в основную базу. Запрос с небезопасным
+    методом открывает окно основной базы, даже если запись ушла
+    в очередь ``posts.write_behind``, которая пишет в другом потоке;
+    запись из GET отмечают ``db_for_write`` или сама очередь. """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            mark_written()
+        return view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,296 @@
+""" Полнотекстовый поиск по постам и комментариям.
+
+На SQLite используется индекс FTS5 ``posts_post_fts``: своя строка
+у поста (rowid = id поста, столбец text) и у каждого комментария
+(rowid = -id комментария, столбец comments), в столбце post_id - пост.
+Новый комментарий добавляет одну строку, а не переиндексирует пост
+со всеми комментариями. Пост находится, если все слова запроса есть
+в его тексте или в одном из комментариев; ранг поста - лучший bm25
+среди его строк. Индекс обновляется сигналами при сохранении и
+удалении постов и комментариев.
+На других базах (или через настройку ``SEARCH_BACKEND``) подключается
+другой бэкенд с тем же интерфейсом. """
+import base64
+import binascii
+import re
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .paginators import CursorPage
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+
+
+def terms(query):
+    """ Слова запроса без операторов и кавычек. """
+    return WORD.findall(query.lower())
+
+
+class BaseSearchBackend:
+    """ Интерфейс бэкенда поиска.
+
+    ``search`` возвращает пары (id поста, ранг) - чем меньше ранг,
+    тем выше пост в выдаче; при равном ранге выше больший id. """
+
+    def index_post(self, post_id):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def index_comment(self, comment_id):
+        pass
+
+    def index_latest_comments(self, post_id, count):
+        pass
+
+    def remove_comment(self, comment_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, limit, position=None, group_id=None,
+               author_id=None):
+        raise NotImplementedError
+
+    def filter_queryset(self, queryset, query, post_field='pk',
+                        column=None):
+        """ Строки queryset, чей пост (поле post_field) найден
+        по запросу; column ограничивает поиск текстом постов
+        ('text') или комментариев ('comments'). """
+        raise NotImplementedError
+
+
+class SqliteFTSBackend(BaseSearchBackend):
+    """ Индекс SQLite FTS5 с ранжированием bm25. """
+
+    def match(self, query, column=None):
+        words = terms(query)
+        if not words:
+            return None
+        # Каждое слово ищется как префикс: «котик» найдёт «котиками».
+        expression = ' '.join(f'"{word}"*' for word in words)
+        if column is not None:
+            expression = f'{column} : ({expression})'
+        return expression
+
+    def index_post(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, comments, post_id) '
+                "SELECT id, text, '', id FROM posts_post WHERE id = %s",
+                [post_id])
+
+    def remove_post(self, post_id):
+        # Строки комментариев удаляют сигналы каскадного удаления.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+    def index_comment(self, comment_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, comments, post_id) '
+                "SELECT -id, '', text, post_id FROM posts_comment "
+                'WHERE id = %s', [comment_id])
+
+    def index_latest_comments(self, post_id, count):
+        """ Добавляет в индекс последние count комментариев поста.
+
+        Вызывается в транзакции, записавшей их пачкой (без id):
+        другие писатели SQLite ждут её коммита, поэтому последние
+        комментарии поста - именно эти. """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, comments, post_id) '
+                "SELECT -id, '', text, post_id FROM posts_comment "
+                'WHERE post_id = %s ORDER BY id DESC LIMIT %s',
+                [post_id, count])
+
+    def remove_comment(self, comment_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [-comment_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            for sql in self.documents_sql():
+                cursor.execute(sql)
+
+    @staticmethod
+    def documents_sql():
+        """ Запросы, заполняющие индекс всеми постами и комментариями. """
+        insert = f'INSERT INTO {FTS_TABLE} (rowid, text, comments, post_id)'
+        return [
+            f"{insert} SELECT id, text, '', id FROM posts_post",
+            f"{insert} SELECT -id, '', text, post_id FROM posts_comment",
+        ]
+
+    def search(self, query, limit, position=None, group_id=None,
+               author_id=None):
+        match = self.match(query)
+        if match is None:
+            return []
+        where, params = [], [match]
+        if group_id is not None:
+            where.append('p.group_id = %s')
+            params.append(group_id)
+        if author_id is not None:
+            where.append('p.author_id = %s')
+            params.append(author_id)
+        rank_column = 'matches.rank'
+        order = f'{rank_column}, p.id DESC'
+        if position is not None:
+            reverse, rank, pk = position
+            rank_sign, pk_sign = ('<', '>') if reverse else ('>', '<')
+            where.append(
+                f'({rank_column} {rank_sign} %s OR '
+                f'({rank_column} = %s AND p.id {pk_sign} %s))')
+            if reverse:
+                order = f'{rank_column} DESC, p.id'
+            params.extend([rank, rank, pk])
+        with connection.cursor() as cursor:
+            # Скрытый столбец rank индекса FTS5 по умолчанию равен bm25().
+            cursor.execute(
+                f'SELECT p.id, {rank_column} FROM ('
+                f'  SELECT post_id, MIN(rank) AS rank FROM {FTS_TABLE}'
+                f'  WHERE {FTS_TABLE} MATCH %s GROUP BY post_id'
+                ') matches JOIN posts_post p ON p.id = matches.post_id '
+                f'WHERE {" AND ".join(where) or "1"} '
+                f'ORDER BY {order} LIMIT %s', params + [limit])
+            return cursor.fetchall()
+
+    def filter_queryset(self, queryset, query, post_field='pk',
+                        column=None):
+        match = self.match(query, column)
+        if match is None:
+            return queryset
+        opts = queryset.model._meta
+        field = opts.pk if post_field == 'pk' else opts.get_field(post_field)
+        return queryset.extra(
+            where=[
+                f'{opts.db_table}.{field.column} IN (SELECT post_id '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'],
+            params=[match])
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """ Поиск перебором через LIKE для баз без полнотекстового индекса.
+
+    Все найденные посты имеют одинаковый ранг. """
+
+    def condition(self, query, prefix='', column=None):
+        condition = Q()
+        for word in terms(query):
+            word_condition = Q()
+            if column in (None, 'text'):
+                word_condition |= Q(**{f'{prefix}text__icontains': word})
+            if column in (None, 'comments'):
+                word_condition |= Q(
+                    **{f'{prefix}comments__text__icontains': word})
+            condition &= word_condition
+        return condition
+
+    def search(self, query, limit, position=None, group_id=None,
+               author_id=None):
+        from .models import Post
+
+        if not terms(query):
+            return []
+        posts = Post.objects.filter(self.condition(query)).distinct()
+        if group_id is not None:
+            posts = posts.filter(group_id=group_id)
+        if author_id is not None:
+            posts = posts.filter(author_id=author_id)
+        if position is None:
+            posts = posts.order_by('-pk')
+        elif position[0]:
+            posts = posts.filter(pk__gt=position[2]).order_by('pk')
+        else:
+            posts = posts.filter(pk__lt=position[2]).order_by('-pk')
+        return [(pk, 0.0) for pk in posts.values_list('pk', flat=True)[
+            :limit]]
+
+    def filter_queryset(self, queryset, query, post_field='pk',
+                        column=None):
+        from .models import Post
+
+        posts = Post.objects.filter(self.condition(query, column=column))
+        return queryset.filter(**{f'{post_field}__in': posts.values('pk')})
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'sqlite':
+            _backend = SqliteFTSBackend()
+        else:
+            _backend = LikeSearchBackend()
+    return _backend
+
+
+class SearchPaginator(Paginator):
+    """ Паджинация результатов поиска по ключу (ранг, id).
+
+    Страницы - те же ``CursorPage``, что и у лент. """
+
+    def __init__(self, query, per_page, group_id=None, author_id=None,
+                 backend=None):
+        super().__init__([], per_page)
+        self.query = query
+        self.filters = {'group_id': group_id, 'author_id': author_id}
+        self.backend = backend or get_backend()
+
+    def encode_cursor(self, row, reverse=False):
+        pk, rank = row
+        raw = f"{'p' if reverse else 'n'}|{rank!r}|{pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            direction, rank, pk = raw.split('|')
+            rank, pk = float(rank), int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            return None
+        if direction not in ('n', 'p'):
+            return None
+        return direction == 'p', rank, pk
+
+    def get_page(self, cursor):
+        from .models import Post
+
+        position = self.decode_cursor(cursor) if cursor else None
+        rows = self.backend.search(
+            self.query, self.per_page + 1, position, **self.filters)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        reverse = position is not None and position[0]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        posts = Post.objects.for_feed().in_bulk([pk for pk, _ in rows])
+        objects = [posts[pk] for pk, _ in rows if pk in posts]
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], reverse=True)
+        return CursorPage(objects, self, next_cursor, previous_cursor)
@@ -0,0 +1,201 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import DateTimeField, F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import caching, feed_cache, search, timeline
+from .models import Comment, Follow, Group, Post, UserStats
+from .stats import last_post_date
+
+
+def now_and_on_commit(func):
+    """ Выполняет func сразу и, если идёт транзакция, ещё раз после
+    коммита: то, что другой запрос успел закэшировать по данным
+    до коммита, тоже сбрасывается. """
+    func()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(func)
+
+
+def bump(*feeds):
+    """ Сбрасывает кэш лент и после коммита транзакции: иначе
+    страница, собранная параллельным запросом до коммита, попала бы
+    в кэш под новой версией ленты и жила бы часами. """
+    now_and_on_commit(lambda: feed_cache.bump(*feeds))
+
+
+def change_stats(user_id, field, delta):
+    """ Атомарно изменяет счётчик пользователя на delta.
+
+    Счётчик не уходит ниже нуля: расхождения исправляет
+    команда ``recount_stats``. """
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    updated = stats.update(**{field: F(field) + delta})
+    if not updated and delta > 0:
+        UserStats.objects.get_or_create(
+            user_id=user_id, defaults={field: delta})
+
+
+def change_group_stats(group_id, delta, pub_date=None):
+    """ Изменяет счётчик постов группы на delta. Новый пост
+    сдвигает время последнего поста вперёд, убранный -
+    пересчитывает его по оставшимся постам группы. """
+    if group_id is None:
+        return
+    groups = Group.objects.filter(pk=group_id)
+    if delta > 0:
+        pub_date = Value(pub_date, output_field=DateTimeField())
+        groups.update(
+            posts_count=F('posts_count') + delta,
+            last_post_at=Greatest(
+                Coalesce('last_post_at', pub_date), pub_date))
+    else:
+        groups.filter(posts_count__gte=-delta).update(
+            posts_count=F('posts_count') + delta)
+        groups.update(last_post_at=last_post_date())
+    bump('group-stats')
+
+
+@receiver(post_save, sender=get_user_model())
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    # Отсутствие пользователя с этим именем могло попасть в кэш.
+    username = instance.username
+    now_and_on_commit(lambda: caching.forget_user_id(username))
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    # При смене группы нужно сбросить кэш и старой группы.
+    if instance.pk and not raw:
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        change_stats(instance.author_id, 'posts_count', 1)
+        change_group_stats(instance.group_id, 1, instance.pub_date)
+        timeline.fan_out(instance)
+        bump(f'stats:{instance.author_id}')
+    else:
+        previous_group_id = getattr(instance, '_previous_group_id', None)
+        if previous_group_id != instance.group_id:
+            change_group_stats(previous_group_id, -1)
+            change_group_stats(instance.group_id, 1, instance.pub_date)
+    bump(*feed_cache.post_feeds(
+        instance, getattr(instance, '_previous_group_id', None)))
+    search.get_backend().index_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    change_stats(instance.author_id, 'posts_count', -1)
+    change_group_stats(instance.group_id, -1)
+    search.get_backend().remove_post(instance.pk)
+    bump(
+        *feed_cache.post_feeds(instance), f'stats:{instance.author_id}')
+
+
+def comments_added(post_id, count=1):
+    """ Счётчик поста после новых комментариев. """
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + count)
+
+
+def follows_added(follows):
+    """ Счётчики и ленты после новых подписок. """
+    for follow in follows:
+        change_stats(follow.author_id, 'followers_count', 1)
+        change_stats(follow.user_id, 'following_count', 1)
+        timeline.backfill(follow.user_id, follow.author_id)
+
+
+def follow_feeds(follow):
+    return [
+        f'follow:{follow.user_id}',
+        f'stats:{follow.user_id}',
+        f'stats:{follow.author_id}']
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        comments_added(instance.post_id)
+        search.get_backend().index_comment(instance.pk)
+        bump(*feed_cache.post_feeds(instance.post))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(
+        pk=instance.post_id, comment_count__gt=0
+    ).update(comment_count=F('comment_count') - 1)
+    search.get_backend().remove_comment(instance.pk)
+    # При каскадном удалении поста его строки уже может не быть.
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None:
+        bump(*feed_cache.post_feeds(post))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        follows_added([instance])
+        bump(*follow_feeds(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_stats(instance.author_id, 'followers_count', -1)
+    change_stats(instance.user_id, 'following_count', -1)
+    timeline.trim(instance.user_id, instance.author_id)
+    timeline.refill(instance.author_id)
+    bump(*follow_feeds(instance))
+
+
+def group_feeds(group_id):
+    """ Ленты, где показаны название и ссылка группы: посты группы
+    есть в общей ленте, лентах подписок и профилях их авторов. """
+    authors = Post.objects.filter(group_id=group_id).order_by().values_list(
+        'author_id', flat=True).distinct()
+    return [
+        'groups', 'index', f'group:{group_id}',
+        *(f'profile:{author_id}' for author_id in authors)]
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_feeds(sender, instance, **kwargs):
+    # После удаления у постов группы уже нет, найти авторов не выйдет.
+    instance._feeds = group_feeds(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        bump('groups', f'group:{instance.pk}')
+    else:
+        bump(*group_feeds(instance.pk))
+    now_and_on_commit(caching.forget_group_choices)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    bump(*getattr(instance, '_feeds', group_feeds(instance.pk)))
+    now_and_on_commit(caching.forget_group_choices)
@@ -0,0 +1,23 @@
+""" Прагмы SQLite для каждого нового соединения.
+
+Значения берутся из ``SQLITE_PRAGMAS`` (профиль базы в настройках).
+Режим журнала WAL хранится в самом файле базы, остальные прагмы
+действуют только на своё соединение, поэтому выполняются при
+каждом подключении; с ``CONN_MAX_AGE`` это редко. """
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        # PRAGMA не принимает параметры запроса;
+        # имена и значения приходят только из настроек.
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,31 @@
+""" Подзапросы для пересчёта хранимых счётчиков. """
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Follow, Post
+
+# Счётчик UserStats -> (модель, поле со ссылкой на пользователя).
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def count_related(model, field, outer='pk'):
+    """ Подзапрос: количество строк model, у которых field
+    ссылается на внешнее поле outer. """
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef(outer)}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count'),
+        output_field=IntegerField()), 0)
+
+
+def last_post_date(outer='pk'):
+    """ Подзапрос: дата последнего поста группы outer. """
+    return Subquery(
+        Post.objects.filter(group=OuterRef(outer)).order_by(
+            '-pub_date').values('pub_date')[:1])
@@ -0,0 +1,39 @@
+from django import template
+from django.core.cache import cache
+
+from posts import feed_cache, routers
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, key):
+        self.nodelist = nodelist
+        self.key = key
+
+    def render(self, context):
+        key = self.key.resolve(context)
+        if not key:
+            return self.nodelist.render(context)
+        html = cache.get(key)
+        feed_cache.record(hit=html is not None)
+        if html is None:
+            html = self.nodelist.render(context)
+            cache.set(key, html, routers.cache_timeout(
+                feed_cache.timeout(feed_cache.FEED_CACHE_TIMEOUT)))
+        return html
+
+
+@register.tag('feedcache')
+def do_feedcache(parser, token):
+    """ Кэширует фрагмент ленты по ключу из ``feed_cache_key``:
+
+        {% feedcache feed_cache_key %} ... {% endfeedcache %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' принимает ровно один аргумент - ключ кэша.")
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+    return FeedCacheNode(nodelist, parser.compile_filter(bits[1]))
@@ -0,0 +1,23 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(post, size):
+    """ Готовая миниатюра картинки поста или None, пока она создаётся:
+
+        {% ready_thumbnail post "feed" as im %}
+    """
+    return thumbnails.ready_thumbnail(post, size)
+
+
+@register.simple_tag
+def thumbnail_srcset(post, size, format=None):
+    """ srcset из готовых копий картинки поста разной ширины:
+
+        {% thumbnail_srcset post "feed" "WEBP" %}
+    """
+    return thumbnails.ready_srcset(post, size, format)
@@ -0,0 +1,234 @@
+import time
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase
+from django.urls import reverse
+from posts import caching, feed_cache
+from posts.models import Comment, Follow, Group, Post
+
+
+class GetOrComputeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.compute = mock.Mock(return_value='новое')
+
+    def test_value_is_computed_once(self):
+        """ Повторный вызов берёт значение из кэша. """
+        for _ in range(3):
+            self.assertEqual(
+                caching.get_or_compute('key', self.compute, 60), 'новое')
+        self.compute.assert_called_once()
+
+    def test_expiring_value_is_recomputed_early(self):
+        """ Значение с истёкшим сроком пересчитывается заранее. """
+        cache.set('key', ('старое', 1.0, time.time() - 1), 60)
+        self.assertEqual(
+            caching.get_or_compute('key', self.compute, 60), 'новое')
+        self.assertFalse(cache.get('key:lock'))
+
+    def test_stale_value_served_while_other_recomputes(self):
+        """ Пока другой процесс пересчитывает, отдаётся старое значение. """
+        cache.set('key', ('старое', 1.0, time.time() - 1), 60)
+        cache.add('key:lock', 1)
+        self.assertEqual(
+            caching.get_or_compute('key', self.compute, 60), 'старое')
+        self.compute.assert_not_called()
+
+    @mock.patch('posts.caching.LOCK_WAIT', 0)
+    @mock.patch('posts.caching.LOCK_ATTEMPTS', 1)
+    def test_miss_with_foreign_lock_computes_after_wait(self):
+        """ Не дождавшись чужого пересчёта, значение считается само,
+        а чужая блокировка остаётся на месте. """
+        cache.add('key:lock', 1)
+        self.assertEqual(
+            caching.get_or_compute('key', self.compute, 60), 'новое')
+        self.assertTrue(cache.get('key:lock'))
+
+
+class CachedFeedPageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(text='Первый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feed_page_is_served_from_cache(self):
+        """ Повторная страница ленты не обращается к базе,
+        новый пост сразу попадает в ленту. """
+        self.client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('index'))
+        self.assertEqual(len(response.context['page']), 1)
+
+        Post.objects.create(text='Второй пост', author=self.author)
+        response = self.client.get(reverse('index'))
+        self.assertEqual(len(response.context['page']), 2)
+
+    def test_profile_stats_are_cached(self):
+        """ Счётчики профиля кэшируются и сбрасываются при изменении. """
+        url = reverse('profile', kwargs={'username': self.author.username})
+        self.client.get(url)
+        # остаётся только загрузка автора: его id по username
+        # для ETag и для самой страницы берётся из кэша
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.context['count_posts'], 1)
+        Post.objects.create(text='Второй пост', author=self.author)
+        response = self.client.get(url)
+        self.assertEqual(response.context['count_posts'], 2)
+
+    def test_group_change_refreshes_feeds(self):
+        """ Новое название группы видно в общей ленте и профиле,
+        после удаления группы её ссылки из лент пропадают. """
+        group = Group.objects.create(
+            title='Старое название', slug='old', description='Описание')
+        Post.objects.create(
+            text='Пост в группе', author=self.author, group=group)
+        urls = (reverse('index'), reverse('profile', args=['author']))
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        group.title = 'Новое название'
+        group.save()
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, 'Новое название')
+        group.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(
+                    self.client.get(url), reverse('group', args=['old']))
+
+    @mock.patch('posts.feed_cache.CACHE_SHARED', False)
+    def test_local_cache_expires_versions(self):
+        """ В кэше процесса версия ленты живёт недолго: сброс версии
+        в другом процессе заметен не позже LOCAL_CACHE_TIMEOUT. """
+        url = reverse('index')
+        etag = self.client.get(url)['ETag']
+        later = time.time() + feed_cache.LOCAL_CACHE_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ResolveUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.request = RequestFactory().get('/')
+        self.request.user = AnonymousUser()
+
+    def test_user_is_loaded_once_per_request(self):
+        """ Повторный поиск в том же запросе не обращается к базе,
+        id по username берётся из кэша и в следующих запросах. """
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                caching.resolve_user(self.request, 'author'), self.user)
+        with self.assertNumQueries(0):
+            caching.resolve_user(self.request, 'author')
+        self.request.resolved_users.clear()
+        with self.assertNumQueries(1):
+            caching.resolve_user(self.request, 'author')
+
+    def test_renamed_user(self):
+        """ Устаревший id из кэша не выдаёт чужого пользователя. """
+        self.assertEqual(caching.cached_user_id('author'), self.user.pk)
+        self.user.username = 'writer'
+        self.user.save()
+        self.assertIsNone(caching.resolve_user(self.request, 'author'))
+        self.assertEqual(
+            caching.resolve_user(self.request, 'writer'), self.user)
+
+    def test_new_user_is_found(self):
+        """ Закэшированное отсутствие пользователя сбрасывается,
+        когда пользователь с этим именем появляется. """
+        client = Client()
+        self.assertEqual(client.get('/ghost/').status_code, 404)
+        ghost = User.objects.create_user(username='ghost')
+        self.assertEqual(client.get('/ghost/').status_code, 200)
+        client.force_login(self.user)
+        client.get('/ghost/follow/')
+        self.assertTrue(
+            Follow.objects.filter(user=self.user, author=ghost).exists())
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group)
+        cls.urls = {
+            'index': reverse('index'),
+            'group': reverse('group', kwargs={'slug': 'group'}),
+            'profile': reverse('profile', kwargs={'username': 'author'}),
+            'post': reverse('post', kwargs={
+                'username': 'author', 'post_id': cls.post.pk}),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_unchanged_pages_return_304(self):
+        """ Повторный запрос с ETag получает 304 не больше
+        чем за один запрос к базе. """
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                etag = self.client.get(url)['ETag']
+                # id группы и поста ищутся в базе, id автора - в кэше
+                queries = 0 if name in ('index', 'profile') else 1
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_logged_in_user_gets_own_etag(self):
+        """ У вошедшего пользователя свой ETag, а 304 стоит
+        одного запроса - чтения сессии. """
+        url = self.urls['index']
+        anonymous_etag = self.client.get(url)['ETag']
+        self.client.force_login(self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_refresh_pages(self):
+        """ Новый комментарий меняет ETag всех страниц с постом,
+        а время изменения попадает в Last-Modified. """
+        etags = {name: self.client.get(url)['ETag']
+                 for name, url in self.urls.items()}
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий')
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[name])
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Last-Modified', response)
+
+
+class BumpOnCommitTests(TransactionTestCase):
+    def test_feed_is_bumped_after_commit(self):
+        """ Версия, под которой параллельный запрос закэшировал бы
+        страницу до коммита, после коммита уже не действует. """
+        cache.clear()
+        author = User.objects.create_user(username='author')
+        with transaction.atomic():
+            Post.objects.create(text='Пост', author=author)
+            versions = feed_cache.feed_versions('index')
+        self.assertNotEqual(feed_cache.feed_versions('index'), versions)
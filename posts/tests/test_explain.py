@@ -0,0 +1,28 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from posts.models import Comment, Follow, Group, Post
+
+
+class ExplainViewsTests(TestCase):
+    def test_feeds_use_indexes(self):
+        """ Ленты, пост и подписки читаются по индексам,
+        без полных просмотров постов и сортировок. """
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        post = Post.objects.create(text='Пост', author=author, group=group)
+        Comment.objects.create(post=post, author=reader, text='Коммент')
+        Follow.objects.create(user=reader, author=author)
+        out = StringIO()
+        call_command('explain_views', stdout=out)
+        report = out.getvalue()
+        for page in ('index', 'group', 'profile', 'post', 'follow_index'):
+            self.assertIn(f'\n{page} /', '\n' + report)
+        self.assertNotIn('USE TEMP B-TREE', report)
+        for table in ('posts_post', 'posts_comment', 'posts_follow',
+                      'posts_timelineentry'):
+            self.assertNotIn(f'SCAN {table}\n', report)
@@ -0,0 +1,88 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from posts.models import Comment, Follow, Group, Post
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """ Создание группы, постов, комментария и подписки. """
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        for i in range(5):
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=group)
+        Comment.objects.create(
+            post=Post.objects.first(), author=cls.reader, text='Коммент')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.output = self.workdir.name
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def export(self, *args):
+        out = StringIO()
+        call_command(
+            'export_content', self.output, '--chunk-size', '2', *args,
+            stdout=out)
+        return out.getvalue()
+
+    def read_jsonl(self, name):
+        with gzip.open(os.path.join(self.output, name), 'rt') as stream:
+            return [json.loads(line) for line in stream]
+
+    def test_jsonl_gzip_export(self):
+        """ Все строки выгружаются по порядку, в том числе
+        несколькими кусками. """
+        out = self.export('--gzip')
+        self.assertIn('posts: 5', out)
+        posts = self.read_jsonl('posts.jsonl.gz')
+        self.assertEqual(
+            [post['text'] for post in posts],
+            [f'Пост {i}' for i in range(5)])
+        self.assertEqual(posts[0]['author__username'], 'author')
+        self.assertEqual(len(self.read_jsonl('comments.jsonl.gz')), 1)
+        self.assertEqual(len(self.read_jsonl('follows.jsonl.gz')), 1)
+
+    def test_csv_export(self):
+        """ CSV с заголовком из полей выгрузки. """
+        self.export('--format', 'csv', '--models', 'groups')
+        with open(os.path.join(self.output, 'groups.csv')) as stream:
+            rows = list(csv.DictReader(stream))
+        self.assertEqual(rows[0]['slug'], 'group')
+
+    def test_incremental_export(self):
+        """ Повторная выгрузка содержит только новые строки. """
+        self.export('--incremental')
+        out = self.export('--incremental')
+        self.assertIn('posts: 0', out)
+        Post.objects.create(text='Новый пост', author=self.author)
+        out = self.export('--incremental', '--models', 'posts')
+        self.assertIn('posts: 1', out)
+        with open(os.path.join(self.output, 'posts.jsonl')) as stream:
+            posts = [json.loads(line) for line in stream]
+        self.assertEqual([post['text'] for post in posts], ['Новый пост'])
+
+    def test_full_export_keeps_other_marks(self):
+        """ Полная выгрузка одной модели не сбрасывает знаки
+        остальных: следующая инкрементальная их не повторяет. """
+        self.export('--incremental')
+        self.export('--models', 'groups')
+        out = self.export('--incremental')
+        self.assertIn('posts: 0', out)
+        self.assertIn('comments: 0', out)
+        self.assertIn('groups: 0', out)
@@ -1,22 +1,21 @@
-import shutil
-import tempfile
-
-from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase
 from django.urls import reverse
+from posts import feed_cache
+from posts.forms import PostForm
 from posts.models import Group, Post
 
+from .utils import TempMediaMixin
+
 
-class FormsTests(TestCase):
+class FormsTests(TempMediaMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         """ Создание тестовых данных. """
         super().setUpClass()
 
-        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
-
         cls.user = User.objects.create_user(username='test')
         cls.group = Group.objects.create(
             title='Тестовая группа',
@@ -44,11 +43,6 @@ class FormsTests(TestCase):
             content_type='image/gif'
         )
 
-    @classmethod
-    def tearDownClass(cls):
-        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
-        super().tearDownClass()
-
     def setUp(self):
         """ Создание тестового клиента. """
         self.authorized_client = Client()
@@ -100,3 +94,25 @@ class FormsTests(TestCase):
                 author=self.user
             ).exists()
         )
+
+    def test_group_choices_are_lazy(self):
+        """ Форма не обращается к базе при создании, список групп
+        берётся при отрисовке из памяти процесса до изменения групп. """
+        cache.clear()
+        with self.assertNumQueries(0):
+            form = PostForm()
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(form.fields['group'].choices)[1:],
+                [(self.group.pk, self.group.title)])
+        with self.assertNumQueries(0):
+            PostForm().as_p()
+        group = Group.objects.create(title='Новая группа', slug='new')
+        self.assertIn(
+            (group.pk, group.title), PostForm().fields['group'].choices)
+        # группу изменил другой процесс: версия в кэше уже новая
+        Group.objects.filter(pk=group.pk).update(title='Другое название')
+        feed_cache.bump('groups')
+        self.assertIn(
+            (group.pk, 'Другое название'),
+            PostForm().fields['group'].choices)
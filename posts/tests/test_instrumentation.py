@@ -0,0 +1,80 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import instrumentation
+from posts.models import Group, Post
+
+
+class InstrumentationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        for i in range(3):
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=group)
+
+    def setUp(self):
+        cache.clear()
+        instrumentation.reset()
+        self.client = Client()
+
+    def get_logged(self, url):
+        with self.assertLogs('posts.instrumentation', 'INFO') as logs:
+            self.client.get(url)
+        return logs.records[0], json.loads(logs.records[0].getMessage())
+
+    @mock.patch('posts.instrumentation.PERF_SAMPLE_RATE', 1.0)
+    def test_sampled_request_is_logged(self):
+        """ По замеренному запросу пишется строка со всеми замерами. """
+        record, line = self.get_logged(reverse('index'))
+        self.assertEqual(record.levelname, 'INFO')
+        self.assertEqual(line['view'], 'index')
+        self.assertEqual(line['status'], 200)
+        self.assertGreater(line['queries'], 0)
+        self.assertGreater(line['template_ms'], 0)
+        self.assertGreater(line['cache_misses'], 0)
+        self.assertFalse(line['over_budget'])
+        _, line = self.get_logged(reverse('index'))
+        self.assertGreater(line['cache_hits'], 0)
+
+    @mock.patch('posts.instrumentation.PERF_SAMPLE_RATE', 1.0)
+    @mock.patch('posts.instrumentation.PERF_QUERY_BUDGET', 0)
+    def test_query_budget(self):
+        """ Превышение бюджета запросов - предупреждение в логе. """
+        record, line = self.get_logged(reverse('index'))
+        self.assertEqual(record.levelname, 'WARNING')
+        self.assertTrue(line['over_budget'])
+
+    def test_not_sampled(self):
+        """ С выключенными замерами ничего не пишется и не считается. """
+        with mock.patch('posts.instrumentation.logger') as logger:
+            self.client.get(reverse('index'))
+        logger.info.assert_not_called()
+        self.assertEqual(instrumentation._totals, {})
+
+    @mock.patch('posts.instrumentation.PERF_SAMPLE_RATE', 1.0)
+    def test_metrics_endpoint(self):
+        """ Суммы по представлениям в формате Prometheus,
+        только для сотрудников и внутренних адресов. """
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
+        admin = User.objects.create_user(username='admin', is_staff=True)
+        self.client.force_login(admin)
+        response = self.client.get('/metrics/')
+        self.assertEqual(response['Content-Type'],
+                         'text/plain; version=0.0.4')
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_requests_total counter', text)
+        self.assertIn('yatube_requests_total{view="index"} 2', text)
+        self.assertIn('yatube_db_queries_total{view="index"}', text)
+        with self.settings(INTERNAL_IPS=['127.0.0.1']):
+            self.client.logout()
+            self.assertEqual(self.client.get('/metrics/').status_code, 200)
@@ -1,6 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
-from posts.models import Group, Post
+from posts import feed_cache
+from posts.models import Comment, Follow, Group, Post, UserStats
 
 
 class PostModelTest(TestCase):
@@ -63,3 +67,106 @@ class PostModelTest(TestCase):
             str(PostModelTest.group),
             expected_group,
             'Что-то с методом str модели group не так!')
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def assertStats(self, user, posts, followers, following):
+        stats = UserStats.objects.get(user=user)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count, stats.following_count),
+            (posts, followers, following))
+
+    def test_counters_follow_create_and_delete(self):
+        """счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertStats(self.author, 1, 1, 0)
+        self.assertStats(self.reader, 0, 0, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertStats(self.author, 1, 0, 0)
+        self.assertStats(self.reader, 0, 0, 0)
+        post.delete()
+        self.assertStats(self.author, 0, 0, 0)
+
+    def test_recount_stats_command(self):
+        """команда recount_stats исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.update(comment_count=7)
+        UserStats.objects.update(
+            posts_count=5, followers_count=5, following_count=5)
+        UserStats.objects.filter(user=self.reader).delete()
+
+        feeds = (
+            'index', f'profile:{self.author.pk}',
+            f'stats:{self.author.pk}', f'stats:{self.reader.pk}')
+        versions = feed_cache.feed_versions(*feeds)
+        call_command('recount_stats', '--dry-run', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 7)
+        self.assertEqual(feed_cache.feed_versions(*feeds), versions)
+
+        out = StringIO()
+        call_command('recount_stats', stdout=out)
+        self.assertIn('постов - 1, пользователей - 2', out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertStats(self.author, 1, 1, 0)
+        self.assertStats(self.reader, 0, 0, 1)
+        # Кэш страниц с исправленными счётчиками сброшен.
+        for feed, before, after in zip(
+                feeds, versions, feed_cache.feed_versions(*feeds)):
+            with self.subTest(feed=feed):
+                self.assertNotEqual(after, before)
+
+    def test_group_counters(self):
+        """счётчик и последний пост группы следуют за постами."""
+        first = Group.objects.create(title='Первая', slug='first')
+        second = Group.objects.create(title='Вторая', slug='second')
+        old = Post.objects.create(
+            text='Старый пост', author=self.author, group=first)
+        new = Post.objects.create(
+            text='Новый пост', author=self.author, group=first)
+        first.refresh_from_db()
+        self.assertEqual(
+            (first.posts_count, first.last_post_at), (2, new.pub_date))
+
+        new.group = second
+        new.save()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(
+            (first.posts_count, first.last_post_at), (1, old.pub_date))
+        self.assertEqual(
+            (second.posts_count, second.last_post_at), (1, new.pub_date))
+
+        old.delete()
+        first.refresh_from_db()
+        self.assertEqual((first.posts_count, first.last_post_at), (0, None))
+
+        Group.objects.update(posts_count=9, last_post_at=None)
+        versions = feed_cache.feed_versions('groups', 'group-stats')
+        out = StringIO()
+        call_command('recount_stats', stdout=out)
+        self.assertIn('групп - 2', out.getvalue())
+        self.assertNotEqual(
+            feed_cache.feed_versions('groups', 'group-stats'), versions)
+        second.refresh_from_db()
+        self.assertEqual(
+            (second.posts_count, second.last_post_at), (1, new.pub_date))
@@ -0,0 +1,68 @@
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Post
+from posts.paginators import CursorPage, CursorPaginator
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """ Создание 25 постов для постраничного обхода. """
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='paginator')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user) for i in range(25))
+        cls.expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        self.paginator = CursorPaginator(Post.objects.all(), 10)
+
+    def test_walk_forward_and_back(self):
+        """ Проход вперёд и назад по курсорам возвращает все посты
+        в правильном порядке без пропусков и повторов. """
+        pages = [self.paginator.get_page(None)]
+        while pages[-1].has_next():
+            pages.append(self.paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(
+            [post for page in pages for post in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        previous = self.paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(list(previous), self.expected[10:20])
+        first = self.paginator.get_page(previous.previous_cursor)
+        self.assertEqual(list(first), self.expected[:10])
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+
+    def test_deep_page_costs_single_query(self):
+        """ Любая страница - один запрос без COUNT(*). """
+        page = self.paginator.get_page(None)
+        page = self.paginator.get_page(page.next_cursor)
+        with self.assertNumQueries(1):
+            self.paginator.get_page(page.next_cursor)
+
+    def test_broken_cursor_gives_first_page(self):
+        """ Испорченный курсор отдаёт первую страницу. """
+        page = self.paginator.get_page('не-курсор')
+        self.assertEqual(list(page), self.expected[:10])
+
+    def test_views_pagination_modes(self):
+        """ Ленты по умолчанию работают по курсору,
+        а ?page= включает нумерованные страницы. """
+        client = Client()
+        response = client.get(reverse('index'))
+        page = response.context['page']
+        self.assertIsInstance(page, CursorPage)
+        self.assertContains(response, f'?cursor={page.next_cursor}')
+
+        response = client.get(reverse('index'), {'cursor': page.next_cursor})
+        self.assertEqual(
+            list(response.context['page']), self.expected[10:20])
+
+        response = client.get(reverse('index'), {'page': 3})
+        self.assertIs(type(response.context['page'].paginator), Paginator)
+        self.assertEqual(
+            list(response.context['page']), self.expected[20:])
@@ -0,0 +1,112 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import thumbnails
+from posts.models import Comment, Follow, Group, Post
+
+from .utils import QueryBudgetMixin, TempMediaMixin
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+POSTS = 50
+COMMENTS_PER_POST = 3
+
+
+class QueryBudgetTests(QueryBudgetMixin, TempMediaMixin, TestCase):
+    """ Сколько запросов делает каждая страница на холодном кэше.
+
+    Данных больше одной страницы ленты, у постов есть группы,
+    картинки с готовыми миниатюрами и комментарии разных авторов,
+    поэтому лишний запрос на пост или комментарий (N+1) сразу
+    выходит за бюджет. Имена миниатюр хранятся в самом посте, так что
+    бюджет страницы не зависит от её размера. """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(username=f'user{i}') for i in range(5)]
+        cls.author = cls.users[0]
+        groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group{i}',
+                description='Описание')
+            for i in range(3)]
+        for i in range(POSTS):
+            post = Post.objects.create(
+                text=f'Пост {i}', author=cls.users[i % 3],
+                group=groups[i % 3],
+                image=SimpleUploadedFile(
+                    f'small{i}.gif', SMALL_GIF, 'image/gif'))
+            thumbnails.generate_for_post(post.pk)
+            for j in range(COMMENTS_PER_POST):
+                Comment.objects.create(
+                    post=post, author=cls.users[j + 2],
+                    text=f'Комментарий {j}')
+        cls.post = post
+        for user in cls.users[1:]:
+            Follow.objects.create(user=user, author=cls.author)
+        Follow.objects.create(user=cls.author, author=cls.users[1])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.post_kwargs = {
+            'username': self.post.author.username, 'post_id': self.post.pk}
+
+    def assert_page_budget(self, budget, url):
+        with self.assertMaxQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_index(self):
+        self.assert_page_budget(3, reverse('index'))
+
+    def test_index_after_new_post(self):
+        """ Новый пост сбрасывает кэш страницы, но не добавляет
+        запросов. """
+        self.client.get(reverse('index'))
+        Post.objects.create(text='Новый пост', author=self.author)
+        self.assert_page_budget(3, reverse('index'))
+
+    def test_group(self):
+        self.assert_page_budget(5, reverse('group', args=['group0']))
+
+    def test_profile(self):
+        # свой профиль: автор - это request.user
+        self.assert_page_budget(
+            5, reverse('profile', args=[self.author.username]))
+
+    def test_profile_of_other_user(self):
+        self.assert_page_budget(
+            7, reverse('profile', args=[self.users[1].username]))
+
+    def test_post(self):
+        self.assert_page_budget(6, reverse('post', kwargs=self.post_kwargs))
+
+    def test_follow_index(self):
+        self.assert_page_budget(5, reverse('follow_index'))
+
+    def test_post_edit(self):
+        self.client.force_login(self.post.author)
+        self.assert_page_budget(
+            5, reverse('post_edit', kwargs=self.post_kwargs))
+
+    def test_add_comment(self):
+        # комментарий, счётчик и поисковый индекс пишутся одной
+        # транзакцией: в тесте это SAVEPOINT и RELEASE
+        with self.assertMaxQueries(9):
+            response = self.client.post(
+                reverse('add_comment', kwargs=self.post_kwargs),
+                {'text': 'Новый комментарий'})
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+from posts import routers, write_behind
+from posts.models import Post
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """ Основная база - тестовая, реплика - отдельный файл SQLite
+    с другими постами: по тексту на странице видно, откуда
+    она прочитана. """
+
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.workdir = tempfile.mkdtemp()
+        # Реплику из настроек тесты делают зеркалом основной базы.
+        cls.configured = connections.databases.get('replica')
+        cls.close_replica()
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.workdir, 'replica.sqlite3'),
+        }
+        call_command('migrate', database='replica', verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.close_replica()
+        if cls.configured is None:
+            del connections.databases['replica']
+        else:
+            connections.databases['replica'] = cls.configured
+        shutil.rmtree(cls.workdir, ignore_errors=True)
+
+    @staticmethod
+    def close_replica():
+        if hasattr(connections._connections, 'replica'):
+            connections['replica'].close()
+            delattr(connections._connections, 'replica')
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        User.objects.using('replica').bulk_create(
+            [User(pk=self.author.pk, username='author')])
+        Post.objects.create(text='Пост из основной базы', author=self.author)
+        Post.objects.using('replica').bulk_create(
+            [Post(text='Пост с реплики', author_id=self.author.pk)])
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_reads_from_replica(self):
+        for url in (reverse('index'),
+                    reverse('profile', args=[self.author.username])):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Пост с реплики')
+                self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+    def test_writes_go_to_primary(self):
+        """ Новый пост пишется в основную базу, и сразу после
+        записи автор читает оттуда же, пока не выйдет окно. """
+        response = self.client.post(
+            reverse('new_post'), {'text': 'Только что'})
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+        self.assertTrue(Post.objects.filter(text='Только что').exists())
+        self.assertFalse(
+            Post.objects.using('replica').filter(text='Только что').exists())
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Только что')
+        self.assertNotContains(response, 'Пост с реплики')
+
+        cache.clear()
+        with mock.patch('posts.routers.time.time', return_value=2e9):
+            response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Пост с реплики')
+
+    def test_form_page_does_not_stick_to_primary(self):
+        """ Открыть форму - не запись: браузер остаётся на реплике. """
+        response = self.client.get(reverse('new_post'))
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+    @mock.patch('posts.write_behind.WRITE_BEHIND', True)
+    @mock.patch('posts.write_behind.WRITE_BEHIND_WAIT', 0)
+    def test_queued_follow_sticks_to_primary(self):
+        """ Подписка по GET через очередь записи открывает окно
+        основной базы, хотя пишет её другой поток. """
+        reader = User.objects.create_user(username='reader')
+        self.client.force_login(reader)
+        with mock.patch.object(write_behind.queue, 'start'):
+            response = self.client.get(
+                reverse('profile_follow', args=[self.author.username]))
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+        write_behind.queue.flush()
+
+    def test_lagging_replica_is_not_cached_for_long(self):
+        """ На реплике ещё нет поста из основной базы: страница
+        с реплики не получает ETag и не остаётся в кэше дольше
+        отставания реплики. """
+        client = Client()
+        with mock.patch('posts.routers.REPLICA_MAX_LAG', 0):
+            response = client.get(reverse('index'))
+            self.assertNotContains(response, 'Пост из основной базы')
+            self.assertNotIn('ETag', response)
+            # реплика догнала основную базу, версии лент не менялись
+            Post.objects.using('replica').bulk_create([Post(
+                text='Пост из основной базы', author_id=self.author.pk)])
+            response = client.get(reverse('index'))
+        self.assertContains(response, 'Пост из основной базы')
+
+    def test_without_replica_reads_primary(self):
+        with mock.patch('posts.routers.REPLICA_DB', 'missing'):
+            response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Пост из основной базы')
@@ -0,0 +1,113 @@
+from django.contrib.auth.models import User
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import search, write_behind
+from posts.admin import CommentAdmin, PostAdmin
+from posts.models import Comment, Group, Post
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """ Создание постов с разными текстами и комментариями. """
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Котики', slug='cats', description='Про котиков')
+        cls.cat_post = Post.objects.create(
+            text='Котик спит. Котик ест. Котик играет.',
+            author=cls.author, group=cls.group)
+        cls.dog_post = Post.objects.create(
+            text='Собака и котик гуляют', author=cls.other)
+        cls.bird_post = Post.objects.create(
+            text='Птица поёт', author=cls.other)
+        Comment.objects.create(
+            post=cls.bird_post, author=cls.author, text='Похоже на скворца')
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('search'), {'q': query, **params})
+        return [post.pk for post in response.context['page']]
+
+    def test_results_are_ranked(self):
+        """ Пост, где слово встречается чаще, выше в выдаче. """
+        self.assertEqual(
+            self.search('котик'), [self.cat_post.pk, self.dog_post.pk])
+
+    def test_comments_are_searched(self):
+        """ Пост находится по тексту комментария. """
+        self.assertEqual(self.search('скворца'), [self.bird_post.pk])
+
+    def test_filters(self):
+        """ Поиск ограничивается группой и автором. """
+        self.assertEqual(
+            self.search('котик', group='cats'), [self.cat_post.pk])
+        self.assertEqual(
+            self.search('котик', author='other'), [self.dog_post.pk])
+
+    def test_index_follows_changes(self):
+        """ Индекс обновляется при изменении и удалении
+        постов и комментариев. """
+        post = Post.objects.get(pk=self.bird_post.pk)
+        post.text = 'Птица молчит'
+        post.save()
+        self.assertEqual(self.search('поёт'), [])
+        self.assertEqual(self.search('молчит'), [self.bird_post.pk])
+        Comment.objects.filter(post=self.bird_post).delete()
+        self.assertEqual(self.search('скворца'), [])
+        Post.objects.get(pk=self.dog_post.pk).delete()
+        self.assertEqual(self.search('собака'), [])
+
+    def test_comments_have_own_rows(self):
+        """ Каждый комментарий - своя строка индекса, в том числе
+        записанный пачкой; пост находится по любому из них. """
+        Comment.objects.create(
+            post=self.bird_post, author=self.other, text='Или на дрозда')
+        write_behind.write_batch([
+            Comment(post=self.bird_post, author=self.other, text=text)
+            for text in ('Может, соловей', 'Точно не ворона')])
+        for query in ('скворца', 'дрозда', 'соловей', 'ворона'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), [self.bird_post.pk])
+        comment = Comment.objects.get(text='Или на дрозда')
+        comment.delete()
+        self.assertEqual(self.search('дрозда'), [])
+        self.assertEqual(self.search('соловей'), [self.bird_post.pk])
+
+    def test_keyset_pagination(self):
+        """ Страницы по курсору не пересекаются и покрывают выдачу. """
+        for i in range(5):
+            Post.objects.create(text=f'Новость {i}', author=self.author)
+        paginator = search.SearchPaginator('новость', 2)
+        page = paginator.get_page(None)
+        found = [post.pk for post in page]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            found += [post.pk for post in page]
+        self.assertEqual(len(found), 5)
+        self.assertEqual(len(set(found)), 5)
+        previous = paginator.get_page(page.previous_cursor)
+        self.assertEqual([post.pk for post in previous], found[-3:-1])
+
+    def test_admin_uses_index(self):
+        """ Поиск в админке идёт через тот же индекс. """
+        admin_site = None
+        queryset, _ = PostAdmin(Post, admin_site).get_search_results(
+            None, Post.objects.all(), 'собака')
+        self.assertEqual(list(queryset), [self.dog_post])
+        queryset, _ = CommentAdmin(Comment, admin_site).get_search_results(
+            None, Comment.objects.all(), 'скворца')
+        self.assertEqual(queryset.count(), 1)
+        queryset, _ = PostAdmin(Post, admin_site).get_search_results(
+            None, Post.objects.all(), 'котик')
+        self.assertEqual(queryset.count(), 2)
+
+    def test_admin_searches_post_text_only(self):
+        """ Поиск постов в админке не находит слова из комментариев. """
+        queryset, _ = PostAdmin(Post, None).get_search_results(
+            None, Post.objects.all(), 'скворца')
+        self.assertEqual(list(queryset), [])
@@ -0,0 +1,47 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase, override_settings
+
+PRAGMAS = settings.SQLITE_PROFILES['production']
+
+
+def read_pragmas(names):
+    """ Значения прагм у нового соединения с пустым файлом базы. """
+    default = connections[DEFAULT_DB_ALIAS]
+    with tempfile.TemporaryDirectory() as workdir:
+        wrapper = default.__class__(
+            {**default.settings_dict,
+             'NAME': os.path.join(workdir, 'db.sqlite3')},
+            alias='pragmas')
+        try:
+            with wrapper.cursor() as cursor:
+                values = {}
+                for name in names:
+                    cursor.execute(f'PRAGMA {name}')
+                    values[name] = cursor.fetchone()[0]
+        finally:
+            wrapper.close()
+    return values
+
+
+class SqlitePragmasTests(TestCase):
+    @override_settings(SQLITE_PRAGMAS=PRAGMAS)
+    def test_production_profile(self):
+        """ Новое соединение получает прагмы профиля. """
+        self.assertEqual(read_pragmas(PRAGMAS), {
+            'journal_mode': 'wal',
+            'synchronous': 1,
+            'mmap_size': PRAGMAS['mmap_size'],
+            'cache_size': PRAGMAS['cache_size'],
+            'busy_timeout': PRAGMAS['busy_timeout'],
+            'temp_store': 2,
+        })
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_default_profile(self):
+        """ Без профиля остаются настройки SQLite по умолчанию. """
+        self.assertEqual(
+            read_pragmas(['journal_mode']), {'journal_mode': 'delete'})
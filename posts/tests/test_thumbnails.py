@@ -0,0 +1,122 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import thumbnails
+from posts.models import Post
+
+from .utils import TempMediaMixin
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class ThumbnailsTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """ Создание поста с картинкой. """
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.user,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(ThumbnailsTests.user)
+
+    def fresh_post(self):
+        return Post.objects.get(pk=self.post.pk)
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """ Пока миниатюры нет, в ленте заглушка,
+        после генерации - картинка. """
+        self.assertIsNone(thumbnails.ready_thumbnail(self.post, 'feed'))
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Изображение обрабатывается')
+
+        thumbnails.generate_for_post(self.post.pk)
+        thumb = thumbnails.ready_thumbnail(self.fresh_post(), 'feed')
+        self.assertIsNotNone(thumb)
+        response = self.client.get(reverse('index'))
+        self.assertNotContains(response, 'Изображение обрабатывается')
+        self.assertContains(response, thumb.url)
+
+    def test_srcset_lists_widths_and_webp(self):
+        """ После генерации есть копии всех ширин в JPEG и WebP. """
+        self.assertEqual(thumbnails.ready_srcset(self.post, 'feed'), '')
+        thumbnails.generate_for_post(self.post.pk)
+        post = self.fresh_post()
+        for format, extension in ((None, '.jpg'), ('WEBP', '.webp')):
+            with self.subTest(format=format):
+                srcset = thumbnails.ready_srcset(post, 'feed', format)
+                candidates = [item.split() for item in srcset.split(', ')]
+                self.assertEqual(
+                    [width for _, width in candidates],
+                    ['480w', '720w', '960w'])
+                for url, _ in candidates:
+                    self.assertTrue(url.endswith(extension))
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'type="image/webp"')
+
+    def test_stored_variants_match_kvstore(self):
+        """ Имена копий из поля поста совпадают с найденными в kvstore,
+        и при чтении поля kvstore не нужен. """
+        thumbnails.generate_for_post(self.post.pk)
+        post = self.fresh_post()
+        legacy = self.fresh_post()
+        legacy.thumbnail_variants = ''
+        for format in thumbnails.VARIANT_FORMATS:
+            with self.subTest(format=format):
+                with mock.patch.object(
+                        thumbnails.backend, 'get_ready_thumbnail') as lookup:
+                    srcset = thumbnails.ready_srcset(post, 'feed', format)
+                lookup.assert_not_called()
+                self.assertEqual(
+                    srcset, thumbnails.ready_srcset(legacy, 'feed', format))
+
+    def test_new_image_drops_old_variants(self):
+        """ После замены картинки старые копии не показываются. """
+        thumbnails.generate_for_post(self.post.pk)
+        with mock.patch('posts.views.thumbnails.schedule'):
+            self.client.post(
+                reverse('post_edit', args=['author', self.post.pk]), {
+                    'text': 'Пост с новой картинкой',
+                    'image': SimpleUploadedFile(
+                        'other.gif', SMALL_GIF, 'image/gif'),
+                })
+        self.assertEqual(self.fresh_post().thumbnail_variants, '')
+
+    def test_new_post_schedules_thumbnails(self):
+        """ Создание поста с картинкой ставит миниатюры в очередь. """
+        with mock.patch('posts.views.thumbnails.schedule') as schedule:
+            self.client.post(reverse('new_post'), {
+                'text': 'Новый пост',
+                'image': SimpleUploadedFile(
+                    'new.gif', SMALL_GIF, 'image/gif'),
+            })
+        post = Post.objects.get(text='Новый пост')
+        schedule.assert_called_once_with(post)
+
+    def test_warm_thumbnails_command(self):
+        """ Команда создаёт миниатюры всех размеров. """
+        out = StringIO()
+        call_command('warm_thumbnails', '--workers', '1', stdout=out)
+        self.assertIn('Обработано картинок: 1, ошибок: 0', out.getvalue())
+        for size in thumbnails.THUMBNAIL_SIZES:
+            with self.subTest(size=size):
+                self.assertIsNotNone(
+                    thumbnails.ready_thumbnail(self.fresh_post(), size))
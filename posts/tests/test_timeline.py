@@ -0,0 +1,59 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from posts.models import Follow, Post, TimelineEntry
+from posts.timeline import timeline_posts
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """ Создание автора с постом и двух читателей. """
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author)
+
+    def test_follow_fills_and_unfollow_trims_timeline(self):
+        """ Подписка добавляет посты автора в ленту,
+        новый пост раскладывается подписчикам, отписка чистит ленту. """
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(list(timeline_posts(self.reader)), [self.old_post])
+
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(
+            list(timeline_posts(self.reader)), [new_post, self.old_post])
+        self.assertFalse(TimelineEntry.objects.filter(user=self.other))
+
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(list(timeline_posts(self.reader)), [])
+
+    @mock.patch('posts.timeline.TIMELINE_FANOUT_LIMIT', 1)
+    def test_popular_author_is_read_on_fan_in(self):
+        """ Посты автора с большим числом подписчиков не раскладываются,
+        а подмешиваются в ленту при чтении. """
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=new_post))
+        self.assertFalse(TimelineEntry.objects.filter(user=self.other))
+        for user in (self.reader, self.other):
+            with self.subTest(user=user):
+                self.assertEqual(
+                    list(timeline_posts(user)), [new_post, self.old_post])
+
+    @mock.patch('posts.timeline.TIMELINE_FANOUT_LIMIT', 1)
+    def test_author_below_limit_again(self):
+        """ Посты, опубликованные, пока автор был популярным, остаются
+        в ленте, когда подписчиков снова становится не больше предела. """
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        Follow.objects.filter(user=self.other).delete()
+        self.assertEqual(
+            list(timeline_posts(self.reader)), [new_post, self.old_post])
+        self.assertEqual(list(timeline_posts(self.other)), [])
@@ -0,0 +1,128 @@
+import io
+import os
+import resource
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import (SimpleUploadedFile,
+                                            TemporaryUploadedFile)
+from django.test import Client, TestCase
+from django.urls import reverse
+from PIL import Image
+from posts import uploads
+from posts.forms import PostForm
+from posts.models import Post
+
+from .utils import TempMediaMixin
+
+
+def make_image(size, format='JPEG', **save_options):
+    output = io.BytesIO()
+    Image.new('RGB', size, 'red').save(output, format, **save_options)
+    return output.getvalue()
+
+
+def in_child(function, *args):
+    """ Выполняет function в отдельном процессе и возвращает
+    её результат - число. """
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        result = -1
+        try:
+            result = function(*args)
+        finally:
+            os.write(write_end, str(result).encode())
+            os._exit(0)
+    os.close(write_end)
+    with os.fdopen(read_end) as pipe:
+        result = int(pipe.read())
+    os.waitpid(pid, 0)
+    return result
+
+
+def write_big_jpeg(path, side):
+    Image.new('RGB', (side, side), 'gray').save(path, 'JPEG')
+    return 0
+
+
+def validation_peak_kb(path):
+    """ Прирост пикового потребления памяти при проверке формы. """
+    upload = TemporaryUploadedFile(
+        'big.jpg', 'image/jpeg', os.path.getsize(path), None)
+    with open(path, 'rb') as source:
+        shutil.copyfileobj(source, upload)
+    upload.seek(0)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    form = PostForm(data={'text': 'Текст'}, files={'image': upload})
+    if not form.is_valid():
+        return -1
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+
+
+class UploadsTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(UploadsTests.user)
+
+    def post_image(self, content, name='image.jpg'):
+        return self.client.post(reverse('new_post'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(name, content, 'image/jpeg'),
+        })
+
+    @mock.patch('posts.uploads.POST_IMAGE_MAX_BYTES', 1024)
+    def test_oversized_upload_is_rejected(self):
+        """ Файл больше лимита отклоняется, пост не создаётся. """
+        response = self.post_image(make_image((200, 200), quality=100))
+        self.assertFormError(
+            response, 'form', 'image', uploads.size_error().message)
+        self.assertFalse(Post.objects.exists())
+
+    @mock.patch('posts.uploads.POST_IMAGE_MAX_PIXELS', 100)
+    def test_too_many_pixels_is_rejected(self):
+        """ Картинка с лишними пикселями отклоняется по заголовку. """
+        response = self.post_image(make_image((20, 20)))
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка слишком большая: 20x20 пикселей.')
+        self.assertFalse(Post.objects.exists())
+
+    def test_truncated_image_is_rejected(self):
+        """ Обрезанный JPEG - ошибка формы, а не ошибка сервера. """
+        content = make_image((800, 600), quality=100)[:2000]
+        response = self.post_image(content)
+        self.assertFormError(
+            response, 'form', 'image',
+            'Не удалось прочитать картинку: файл повреждён.')
+        self.assertFalse(Post.objects.exists())
+
+    def test_image_is_bounded_and_stripped(self):
+        """ Картинка уменьшается до POST_IMAGE_MAX_SIDE, EXIF удаляется. """
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        self.post_image(make_image((3000, 100), exif=exif.tobytes()))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size[0], uploads.POST_IMAGE_MAX_SIDE)
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_big_jpeg_is_decoded_at_reduced_scale(self):
+        """ Проверка большой картинки не декодирует её целиком. """
+        side = 6000
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'big.jpg')
+            in_child(write_big_jpeg, path, side)
+            peak_kb = in_child(validation_peak_kb, path)
+        self.assertGreaterEqual(peak_kb, 0)
+        # Pillow хранит RGB по 4 байта на пиксель.
+        full_decode_kb = side * side * 4 // 1024
+        self.assertLess(peak_kb, full_decode_kb * 2 // 3)
@@ -1,8 +1,10 @@
 # posts/tests/test_urls.py
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.test import Client, TestCase
-from django.urls import reverse
+from django.urls import get_resolver, reverse
 from posts.models import Group, Post
+from users.forms import CreationForm
 
 
 class StaticURLTests(TestCase):
@@ -117,3 +119,28 @@ class StaticURLTests(TestCase):
                     response,
                     html,
                     f"Неправильный шаблон у адреса '{url}")
+
+
+class ReservedUsernameTests(TestCase):
+    def test_url_segments_are_reserved(self):
+        """ Имена из первых сегментов адресов сайта заняты:
+        профиль с таким именем перекрыла бы другая страница. """
+        def segments(patterns):
+            for pattern in patterns:
+                route = str(pattern.pattern).lstrip('^')
+                if not route and hasattr(pattern, 'url_patterns'):
+                    yield from segments(pattern.url_patterns)
+                elif route and not route.startswith('<'):
+                    yield route.split('/')[0]
+
+        self.assertLessEqual(
+            set(segments(get_resolver().url_patterns)),
+            set(settings.RESERVED_USERNAMES))
+
+    def test_signup_rejects_reserved_username(self):
+        form = CreationForm(data={
+            'username': 'metrics',
+            'password1': 'Vjqgfhjkm123',
+            'password2': 'Vjqgfhjkm123'})
+        self.assertIn('username', form.errors)
+        self.assertFalse(User.objects.filter(username='metrics').exists())
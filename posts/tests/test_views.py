@@ -1,24 +1,25 @@
-import shutil
-import tempfile
+from unittest import mock
 
 from django import forms
-from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from posts import feed_cache
 from posts.models import Comment, Follow, Group, Post
 
+from .utils import TempMediaMixin
 
-class ViewsTests(TestCase):
+
+class ViewsTests(TempMediaMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         """ Создание тестовых данных. """
         super().setUpClass()
 
-        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
-
         cls.group = Group.objects.create(
             title='Тестовая группа',
             slug='test-group',
@@ -74,11 +75,6 @@ class ViewsTests(TestCase):
             kwargs={'username': cls.creator.username, 'post_id': cls.post.id}
         )
 
-    @classmethod
-    def tearDownClass(cls):
-        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
-        super().tearDownClass()
-
     def setUp(self):
         """ Создание тестовых клиентов - авторизованный и нет. """
         self.guest_client = Client()
@@ -208,27 +204,47 @@ class ViewsTests(TestCase):
         """ Тест проверки кэша. """
         response = self.authorized_client.get(ViewsTests.index_reverse)
         page_first_response = response.content
-        Post.objects.create(
-            text='Тестовый пост 2',
-            author=ViewsTests.creator,
-            group=ViewsTests.group
-        )
+        # Изменение в обход сигналов не сбрасывает кэш
+        Post.objects.filter(pk=ViewsTests.post.pk).update(
+            text='Изменено в обход сигналов')
         response = self.authorized_client.get(ViewsTests.index_reverse)
         page_second_response = response.content
-        # Проверка, что кэш не успел обновиться и содержимое
-        # не изменилось
         self.assertEqual(
             page_first_response,
             page_second_response,
             'Кэш не отработал!')
-        # После очистки кэша, содержимое должно поменяться
-        cache.clear()
+        # Новый пост увеличивает версию ленты и сразу виден
+        Post.objects.create(
+            text='Тестовый пост 2',
+            author=ViewsTests.creator,
+            group=ViewsTests.group
+        )
         response = self.authorized_client.get(ViewsTests.index_reverse)
-        page_third_response = response.content
-        self.assertIsNot(
-            page_third_response,
-            page_second_response,
-            'Содержимое не поменялось!')
+        self.assertContains(response, 'Тестовый пост 2')
+        self.assertContains(response, 'Изменено в обход сигналов')
+
+    def test_cache_feeds_per_page(self):
+        """ Страницы ленты кэшируются отдельно,
+        попадания и промахи учитываются. """
+        cache.clear()
+        for i in range(10):
+            Post.objects.create(text=f'Пост {i}', author=ViewsTests.creator)
+        first = self.guest_client.get(ViewsTests.index_reverse)
+        cursor = first.context['page'].next_cursor
+        second = self.guest_client.get(
+            ViewsTests.index_reverse, {'cursor': cursor})
+        self.assertNotContains(second, 'Пост 9')
+        self.assertContains(second, 'Тестовый пост')
+        self.guest_client.get(ViewsTests.index_reverse, {'cursor': cursor})
+        self.assertEqual(feed_cache.stats(), {'hits': 1, 'misses': 2})
+
+        # Комментарий сбрасывает кэш лент автора поста и группы
+        group_page = self.guest_client.get(ViewsTests.group_reverse)
+        self.assertNotContains(group_page, 'Комментариев: 1')
+        Comment.objects.create(
+            post=ViewsTests.post, author=self.user, text='Комментарий')
+        group_page = self.guest_client.get(ViewsTests.group_reverse)
+        self.assertContains(group_page, 'Комментариев: 1')
 
     def test_follow_unfollow(self):
         """ Тест системы подписок. """
@@ -287,3 +303,150 @@ class ViewsTests(TestCase):
         self.assertRedirects(
             response,
             self.guest_add_comment)
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """ Создание автора, подписчика, группы и одного поста. """
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.reader = User.objects.create_user(username='feed_reader')
+        cls.group = Group.objects.create(
+            title='Группа ленты',
+            slug='feed-group',
+            description='Описание группы ленты'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.add_posts(1)
+        cls.feeds = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': cls.group.slug}),
+            reverse('profile', kwargs={'username': cls.author.username}),
+            reverse('follow_index'),
+        )
+
+    @classmethod
+    def add_posts(cls, count):
+        for i in range(count):
+            post = Post.objects.create(
+                text=f'Пост ленты {i}',
+                author=cls.author,
+                group=cls.group)
+            Comment.objects.create(
+                post=post, author=cls.reader, text='Комментарий')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """ Количество запросов ленты не растёт с числом постов. """
+        self.client.force_login(FeedQueriesTests.reader)
+        single = {url: self.count_queries(url) for url in self.feeds}
+        FeedQueriesTests.add_posts(9)
+        for url in self.feeds:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    len(self.client.get(url).context['page']), 10)
+                self.assertEqual(self.count_queries(url), single[url])
+
+
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """ Пост с пятью комментариями разных авторов. """
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='comment_author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        for i in range(5):
+            Comment.objects.create(
+                post=cls.post, text=f'Комментарий {i}',
+                author=User.objects.create_user(username=f'reader{i}'))
+        cls.post_url = reverse('post', kwargs={
+            'username': cls.author.username, 'post_id': cls.post.pk})
+        cls.comments_url = reverse('post_comments', kwargs={
+            'username': cls.author.username, 'post_id': cls.post.pk})
+
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch('posts.views.COMMENTS_PER_PAGE', 2)
+    def test_comments_are_loaded_in_chunks(self):
+        """ На странице поста первая порция комментариев, следующие -
+        фрагментами по курсору, одним запросом на порцию. """
+        response = self.client.get(self.post_url)
+        page = response.context['comment_page']
+        self.assertEqual(
+            [comment.text for comment in page],
+            ['Комментарий 4', 'Комментарий 3'])
+        texts = []
+        cursor = page.next_cursor
+        while cursor:
+            self.assertContains(
+                response, f'{self.comments_url}?cursor={cursor}')
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(
+                    self.comments_url, {'cursor': cursor})
+            self.assertTemplateUsed(response, 'comment_list.html')
+            self.assertTemplateNotUsed(response, 'base.html')
+            comments = response.context['comment_page']
+            texts += [comment.text for comment in comments]
+            # ленты для ETag, пост с автором и порция с авторами
+            self.assertLessEqual(len(context), 3)
+            cursor = comments.next_cursor
+        self.assertEqual(
+            texts, ['Комментарий 2', 'Комментарий 1', 'Комментарий 0'])
+
+    def test_unknown_post(self):
+        url = reverse('post_comments', kwargs={
+            'username': self.author.username, 'post_id': 0})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class GroupIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='group_author')
+        cls.quiet = Group.objects.create(title='Тихая', slug='quiet')
+        cls.busy = Group.objects.create(title='Активная', slug='busy')
+        for i in range(2):
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.busy)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_group_index(self):
+        """ Каталог групп: активные первыми, со счётчиками;
+        новый пост сразу виден в каталоге. """
+        response = self.client.get(reverse('groups'))
+        self.assertEqual(
+            list(response.context['groups']), [self.busy, self.quiet])
+        self.assertEqual(response.context['groups'][0].posts_count, 2)
+        Post.objects.create(text='Пост', author=self.author, group=self.quiet)
+        response = self.client.get(reverse('groups'))
+        self.assertEqual(
+            list(response.context['groups']), [self.quiet, self.busy])
+
+    def test_group_choices_are_cached(self):
+        """ Форма поста берёт список групп из кэша, пока группы
+        не меняются. """
+        self.client.get(reverse('new_post'))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('new_post'))
+        self.assertFalse(any(
+            'posts_group' in query['sql'] for query in context))
+        choices = list(response.context['form'].fields['group'].choices)
+        self.assertEqual(
+            [label for _, label in choices[1:]], ['Активная', 'Тихая'])
+        Group.objects.create(title='Новая', slug='new')
+        response = self.client.get(reverse('new_post'))
+        self.assertEqual(
+            len(list(response.context['form'].fields['group'].choices)), 4)
@@ -0,0 +1,116 @@
+import uuid
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import feed_cache, write_behind
+from posts.models import Comment, Follow, Post, TimelineEntry, UserStats
+
+
+class WriteBehindTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.comment_url = reverse('add_comment', kwargs={
+            'username': self.author.username, 'post_id': self.post.pk})
+
+    def comment(self, text, key=None):
+        return Comment(
+            post=self.post, author=self.reader, text=text,
+            idempotency_key=key)
+
+    def test_repeated_form_is_saved_once(self):
+        """ Повторная отправка формы с тем же ключом не создаёт
+        второй комментарий. """
+        data = {'text': 'Комментарий', 'idempotency_key': str(uuid.uuid4())}
+        self.client.post(self.comment_url, data)
+        self.client.post(self.comment_url, data)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_two_tabs_with_cached_page(self):
+        """ Вторая вкладка получает ту же страницу по 304, но разные
+        комментарии с одним ключом формы оба сохраняются. """
+        post_url = reverse('post', kwargs={
+            'username': self.author.username, 'post_id': self.post.pk})
+        first = self.client.get(post_url)
+        self.assertContains(
+            first, '<input type="hidden" name="idempotency_key" value="">',
+            html=True)
+        second = self.client.get(
+            post_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        key = str(uuid.uuid4())
+        self.client.post(
+            self.comment_url, {'text': 'Из первой', 'idempotency_key': key})
+        self.client.post(
+            self.comment_url, {'text': 'Из второй', 'idempotency_key': key})
+        self.client.post(
+            self.comment_url, {'text': 'Из второй', 'idempotency_key': key})
+        self.assertEqual(
+            sorted(Comment.objects.values_list('text', flat=True)),
+            ['Из второй', 'Из первой'])
+
+    def test_write_batch(self):
+        """ Пачка пишется без повторов, счётчики и ленты обновляются,
+        версии лент меняются. """
+        key = uuid.uuid4()
+        write_behind.save(self.comment('Уже записан', key))
+        versions = feed_cache.feed_versions(
+            f'profile:{self.author.pk}', f'follow:{self.reader.pk}')
+        first = self.comment('Повтор', key)
+        second = self.comment('Новый', uuid.uuid4())
+        third = self.comment('Без ключа')
+        follow = Follow(user=self.reader, author=self.author)
+        again = Follow(user=self.reader, author=self.author)
+        written = write_behind.write_batch(
+            [first, second, third, follow, again])
+        self.assertEqual(written, {id(second), id(third), id(follow)})
+        self.assertEqual(Comment.objects.count(), 3)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 3)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+        self.assertNotEqual(
+            feed_cache.feed_versions(
+                f'profile:{self.author.pk}', f'follow:{self.reader.pk}'),
+            versions)
+
+    @mock.patch('posts.write_behind.WRITE_BEHIND', True)
+    def test_read_your_writes(self):
+        """ Запрос ждёт коммита пачки со своей записью: после
+        редиректа комментарий и подписка уже видны. """
+        queue = write_behind.queue
+        with mock.patch.object(queue, 'start', side_effect=queue.flush):
+            response = self.client.post(
+                self.comment_url, {'text': 'Из очереди'}, follow=True)
+            self.assertContains(response, 'Из очереди')
+            response = self.client.get(
+                reverse('profile_follow', args=[self.author.username]),
+                follow=True)
+        self.assertTrue(response.context['following'])
+
+    @mock.patch('posts.write_behind.WRITE_BEHIND', True)
+    @mock.patch('posts.write_behind.WRITE_BEHIND_WAIT', 0)
+    def test_without_waiting(self):
+        """ Без ожидания запрос возвращается до записи,
+        комментарий появляется после сброса очереди. """
+        with mock.patch.object(write_behind.queue, 'start'):
+            self.client.post(self.comment_url, {'text': 'Позже'})
+        self.assertFalse(Comment.objects.exists())
+        write_behind.queue.flush()
+        self.assertTrue(Comment.objects.filter(text='Позже').exists())
@@ -0,0 +1,63 @@
+import re
+import shutil
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+# Числа и строки в SQL: без них запросы N+1 становятся одинаковыми.
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def normalize(sql):
+    return LITERALS.sub('?', sql)
+
+
+class QueryBudgetMixin:
+    """ Проверка бюджета SQL-запросов для TestCase. """
+
+    @contextmanager
+    def assertMaxQueries(self, budget, using=connection):
+        """ Блок делает не больше budget запросов. Иначе тест падает
+        со списком запросов, повторяющиеся (признак N+1) - первыми. """
+        with CaptureQueriesContext(using) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed <= budget:
+            return
+        repeated = Counter(
+            normalize(query['sql']) for query in context.captured_queries)
+        lines = [
+            f'{count} x {sql}' for sql, count in repeated.most_common()]
+        self.fail(
+            f'{executed} запросов при бюджете {budget}:\n'
+            + '\n'.join(lines))
+
+
+class TempMediaMixin:
+    """ Картинки тестов сохраняются во временный каталог вне
+    проекта, который удаляется после тестов класса. """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        # override_settings сбрасывает и хранилище файлов
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls.remove_media()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.remove_media()
+
+    @classmethod
+    def remove_media(cls):
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
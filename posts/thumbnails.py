@@ -0,0 +1,169 @@
+""" Предварительная генерация миниатюр картинок постов.
+
+Миниатюры создаются в фоновом пуле потоков после сохранения поста,
+и имена всех готовых копий записываются в поле ``thumbnail_variants``
+поста: шаблон берёт их из уже загруженной строки, без запросов
+к kvstore sorl-thumbnail на каждую копию. Пока копий нет, показывается
+заглушка. Для постов, чьи миниатюры созданы до появления поля,
+копии ищутся в kvstore, пока их не перезапишет ``warm_thumbnails``. """
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import feed_cache
+
+logger = logging.getLogger(__name__)
+
+# Размеры миниатюр, которые используются в шаблонах.
+THUMBNAIL_SIZES = {
+    'feed': ('960x1000', {'crop': 'center', 'upscale': True}),
+    'post': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Ширины уменьшенных копий для srcset; пропорции те же, что у размера.
+VARIANT_WIDTHS = (480, 720)
+# Форматы копий: None - формат исходной картинки.
+VARIANT_FORMATS = (None, 'WEBP')
+THUMBNAIL_WORKERS = getattr(settings, 'THUMBNAIL_WORKERS', 2)
+
+
+class PregeneratedThumbnailBackend(ThumbnailBackend):
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """ Файл миниатюры с тем же именем, что выберет
+        ``get_thumbnail``, но без чтения исходной картинки. """
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """ Готовая миниатюра или None, если она ещё не создана. """
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options))
+
+
+backend = PregeneratedThumbnailBackend()
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails')
+    return _executor
+
+
+def variants(size, format=None):
+    """ Тройки (ширина, geometry, options) всех копий размера size
+    в формате format, от меньшей к большей. """
+    geometry, options = THUMBNAIL_SIZES[size]
+    width, height = (int(side) for side in geometry.split('x'))
+    options = dict(options)
+    if format is not None:
+        options['format'] = format
+    for variant_width in VARIANT_WIDTHS + (width,):
+        variant_height = round(height * variant_width / width)
+        yield (
+            variant_width, f'{variant_width}x{variant_height}', options)
+
+
+def stored_variants(post, size, format=None):
+    """ Пары (ширина, миниатюра) готовых копий картинки поста размера
+    size в формате format, от меньшей к большей. """
+    if not post.image:
+        return []
+    if post.thumbnail_variants:
+        names = json.loads(post.thumbnail_variants)[size][format or '']
+        return [
+            (width, ImageFile(name, default.storage))
+            for width, name in names]
+    ready = []
+    for width, geometry, options in variants(size, format):
+        thumbnail = backend.get_ready_thumbnail(
+            post.image, geometry, **options)
+        if thumbnail is not None:
+            ready.append((width, thumbnail))
+    return ready
+
+
+def ready_thumbnail(post, size):
+    """ Готовая миниатюра картинки поста размера size
+    из THUMBNAIL_SIZES или None. """
+    if not post.image:
+        return None
+    if post.thumbnail_variants:
+        # Копия наибольшей ширины и есть миниатюра размера size.
+        return stored_variants(post, size)[-1][1]
+    geometry, options = THUMBNAIL_SIZES[size]
+    return backend.get_ready_thumbnail(post.image, geometry, **options)
+
+
+def ready_srcset(post, size, format=None):
+    """ Значение srcset из уже созданных копий картинки поста. """
+    return ', '.join(
+        f'{thumbnail.url} {width}w'
+        for width, thumbnail in stored_variants(post, size, format))
+
+
+def generate_thumbnails(image_name):
+    """ Создаёт все миниатюры картинки во всех ширинах и форматах.
+
+    Возвращает имена файлов копий для ``thumbnail_variants``:
+    {размер: {формат или '': [[ширина, имя], ...]}}. """
+    names = {}
+    for size in THUMBNAIL_SIZES:
+        names[size] = {}
+        for format in VARIANT_FORMATS:
+            names[size][format or ''] = [
+                [width, backend.get_thumbnail(
+                    image_name, geometry, **options).name]
+                for width, geometry, options in variants(size, format)]
+    return names
+
+
+def save_variants(image_name, names):
+    """ Записывает имена копий во все посты с этой картинкой. """
+    from .models import Post
+
+    Post.objects.filter(image=image_name).update(
+        thumbnail_variants=json.dumps(names))
+
+
+def generate_for_post(post_id):
+    """ Создаёт миниатюры картинки поста и сбрасывает кэш его лент. """
+    from .models import Post
+
+    close_old_connections()
+    try:
+        post = Post.objects.filter(pk=post_id).first()
+        if post is None or not post.image:
+            return
+        save_variants(post.image.name, generate_thumbnails(post.image.name))
+        feed_cache.bump(*feed_cache.post_feeds(post))
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(post):
+    """ Ставит создание миниатюр поста в очередь после коммита. """
+    if post.image:
+        transaction.on_commit(
+            lambda: get_executor().submit(generate_for_post, post.pk))
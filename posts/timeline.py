@@ -0,0 +1,112 @@
+""" Материализованная лента подписок (fan-out on write).
+
+При публикации пост раскладывается в ленты всех подписчиков автора,
+поэтому ``follow_index`` читает готовую ленту одним индексным
+диапазоном по (user, pub_date). Для авторов, у которых подписчиков
+больше ``TIMELINE_FANOUT_LIMIT``, раскладка не выполняется: их посты
+подмешиваются в ленту при чтении (fan-out on read). Когда подписчиков
+снова становится не больше предела, последние посты автора
+раскладываются по лентам подписчиков заново (``refill``). """
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+TIMELINE_FANOUT_LIMIT = getattr(settings, 'TIMELINE_FANOUT_LIMIT', 1000)
+TIMELINE_BACKFILL = getattr(settings, 'TIMELINE_BACKFILL', 200)
+BATCH_SIZE = 500
+
+
+def is_fanned_out(author_id):
+    """ Раскладываются ли посты автора по лентам подписчиков. """
+    return not UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=TIMELINE_FANOUT_LIMIT).exists()
+
+
+def fan_out(post):
+    """ Добавляет новый пост в ленты подписчиков автора. """
+    if not is_fanned_out(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE)
+
+
+def backfill(user_id, author_id):
+    """ Добавляет в ленту нового подписчика последние посты автора. """
+    if not is_fanned_out(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date')[:TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True)
+
+
+def rebuild(author_id=None):
+    """ Заполняет ленты всех подписчиков последними постами авторов
+    одним INSERT ... SELECT, например после массовой загрузки.
+    С author_id - только посты этого автора. """
+    entries = TimelineEntry._meta.db_table
+    posts = Post._meta.db_table
+    follows = Follow._meta.db_table
+    stats = UserStats._meta.db_table
+    where, params = '', []
+    if author_id is not None:
+        where, params = 'WHERE author_id = %s', [author_id]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+            f'{entries} (user_id, post_id, pub_date) '
+            'SELECT f.user_id, p.id, p.pub_date '
+            f'FROM {follows} f JOIN ('
+            '  SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+            '    PARTITION BY author_id ORDER BY pub_date DESC) AS position'
+            f'  FROM {posts} {where}'
+            ') p ON p.author_id = f.author_id '
+            f'LEFT JOIN {stats} s ON s.user_id = f.author_id '
+            'WHERE p.position <= %s AND COALESCE(s.followers_count, 0) <= %s '
+            f'{connection.ops.ignore_conflicts_suffix_sql(True)}',
+            [*params, TIMELINE_BACKFILL, TIMELINE_FANOUT_LIMIT])
+
+
+def refill(author_id):
+    """ Вызывается после отписки: если подписчиков у автора стало
+    ровно ``TIMELINE_FANOUT_LIMIT``, его посты снова раскладываются,
+    и опубликованные, пока их читали напрямую, добавляются в ленты
+    подписчиков - иначе они пропали бы из лент. """
+    if UserStats.objects.filter(
+            user_id=author_id,
+            followers_count=TIMELINE_FANOUT_LIMIT).exists():
+        rebuild(author_id)
+
+
+def trim(user_id, author_id):
+    """ Убирает из ленты отписавшегося посты автора. """
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def timeline_posts(user):
+    """ Посты ленты подписок пользователя для паджинатора. """
+    fan_in_authors = Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True)
+    if not fan_in_authors.exists():
+        return Post.objects.for_feed().filter(
+            timeline_entries__user=user
+        ).order_by('-timeline_entries__pub_date')
+    # Гибридный режим: материализованная лента
+    # плюс посты популярных авторов, читаемые напрямую.
+    return Post.objects.for_feed().filter(
+        Q(pk__in=TimelineEntry.objects.filter(
+            user=user).values('post_id'))
+        | Q(author_id__in=fan_in_authors))
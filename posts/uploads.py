@@ -0,0 +1,107 @@
+""" Ограниченная по размеру загрузка картинок постов.
+
+Файл принимается потоком во временный файл на диске; после
+``POST_IMAGE_MAX_BYTES`` байт данные перестают сохраняться, и форма
+отклоняет загрузку. Размеры в пикселях проверяются по заголовку до
+декодирования, а картинка перекодируется с ограничением по стороне и
+без метаданных (EXIF, GPS и т.п.). """
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image, ImageOps
+
+POST_IMAGE_MAX_BYTES = getattr(
+    settings, 'POST_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+POST_IMAGE_MAX_PIXELS = getattr(settings, 'POST_IMAGE_MAX_PIXELS', 50_000_000)
+POST_IMAGE_MAX_SIDE = getattr(settings, 'POST_IMAGE_MAX_SIDE', 2048)
+ORIENTATION = 0x0112
+
+
+class OversizedUploadedFile(UploadedFile):
+    """ Загрузка, превысившая лимит: известен только её размер. """
+
+    def __init__(self, name, content_type, size, charset):
+        super().__init__(io.BytesIO(), name, content_type, size, charset)
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """ Перестаёт передавать файл дальше после POST_IMAGE_MAX_BYTES.
+
+    Ставится первым в FILE_UPLOAD_HANDLERS: пока лимит не превышен,
+    данные уходят следующему обработчику (во временный файл). """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > POST_IMAGE_MAX_BYTES:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received > POST_IMAGE_MAX_BYTES:
+            # Этот файл выигрывает у файла следующего обработчика,
+            # в котором осталось только начало загрузки.
+            return OversizedUploadedFile(
+                self.file_name, self.content_type, self.received,
+                self.charset)
+        return None
+
+
+def is_oversized(upload):
+    return upload.size > POST_IMAGE_MAX_BYTES
+
+
+def size_error():
+    return ValidationError(
+        'Файл слишком большой: не больше '
+        f'{POST_IMAGE_MAX_BYTES // (1024 * 1024)} МБ.',
+        code='file_too_large')
+
+
+def reencode(upload):
+    """ Уменьшает картинку до POST_IMAGE_MAX_SIDE и сохраняет заново
+    без метаданных. Картинку, в которой слишком много пикселей,
+    отклоняет, не декодируя. """
+    width, height = upload.image.size
+    if width * height > POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Картинка слишком большая: {width}x{height} пикселей.',
+            code='too_many_pixels')
+    if hasattr(upload, 'temporary_file_path'):
+        source = upload.temporary_file_path()
+    else:
+        upload.seek(0)
+        source = upload
+    try:
+        with Image.open(source) as image:
+            # JPEG умеет декодироваться сразу в уменьшенном в 2-8 раз
+            # масштабе - тогда полный кадр не попадает в память.
+            image.draft(
+                image.mode, (POST_IMAGE_MAX_SIDE, POST_IMAGE_MAX_SIDE))
+            if image.getexif().get(ORIENTATION, 1) != 1:
+                image = ImageOps.exif_transpose(image)
+            image.thumbnail((POST_IMAGE_MAX_SIDE, POST_IMAGE_MAX_SIDE))
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image, format, extension = image.convert('RGBA'), 'PNG', 'png'
+            else:
+                if image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                format, extension = 'JPEG', 'jpg'
+            output = io.BytesIO()
+            image.save(output, format, quality=90, optimize=True)
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        # Обрезанный или повреждённый файл проходит проверку
+        # ImageField по заголовку и падает только при декодировании.
+        raise ValidationError(
+            'Не удалось прочитать картинку: файл повреждён.',
+            code='invalid_image')
+    name = f'{os.path.splitext(upload.name)[0]}.{extension}'
+    return SimpleUploadedFile(
+        name, output.getvalue(), content_type=Image.MIME[format])
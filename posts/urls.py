@@ -3,8 +3,10 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
+    path('group/', views.group_index, name='groups'),
     path('group/<str:slug>/', views.group_posts, name='group'),
     path('new', views.new_post, name='new_post'),
+    path('search/', views.search_posts, name='search'),
     path(
         '<str:username>/<int:post_id>/edit/',
         views.post_edit,
@@ -13,6 +15,10 @@ urlpatterns = [
         "<username>/<int:post_id>/comment",
         views.add_comment,
         name="add_comment"),
+    path(
+        '<str:username>/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'),
     path("follow/", views.follow_index, name="follow_index"),
     path(
         "<str:username>/follow/",
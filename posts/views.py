@@ -1,38 +1,118 @@
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
-from django.db import IntegrityError
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
+from . import search, thumbnails, write_behind
+from .caching import (cached_feed_page, cached_group_directory,
+                      cached_user_id, cached_user_stats, conditional_page,
+                      resolve_user)
+from .feed_cache import feed_cache_key
 from .forms import CommentForm, PostForm
 from .models import Comment, Follow, Group, Post
+from .paginators import (COMMENTS_PER_PAGE, POSTS_PER_PAGE,
+                         CursorPaginator, paginate)
+from .routers import read_from_replica, write_to_primary
+from .timeline import timeline_posts
 
 
+def group_feeds(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list('pk', flat=True).first()
+    return None if group_id is None else [f'group:{group_id}']
+
+
+def get_author(request, username):
+    author = resolve_user(request, username)
+    if author is None:
+        raise Http404('Пользователь не найден.')
+    return author
+
+
+def profile_feeds(request, username):
+    user_id = cached_user_id(username)
+    if user_id is None:
+        return None
+    return [f'profile:{user_id}', f'stats:{user_id}']
+
+
+def post_feeds(request, username, post_id):
+    # get(), а не first(): одну строку по pk не нужно сортировать
+    try:
+        author_id, group_id = Post.objects.values_list(
+            'author_id', 'group_id').get(
+                pk=post_id, author__username=username)
+    except Post.DoesNotExist:
+        return None
+    # Комментарии поста сбрасывают версию ленты автора.
+    feeds = [f'profile:{author_id}', f'stats:{author_id}']
+    if group_id is not None:
+        feeds.append(f'group:{group_id}')
+    return feeds
+
+
+@read_from_replica
+@conditional_page(lambda request: ['index'])
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = cached_feed_page(request, Post.objects.for_feed(), 'index')
     return render(
         request,
         'index.html',
-        {'page': page})
+        {'page': page,
+         'feed_cache_key': feed_cache_key(request, 'index')})
 
 
+@read_from_replica
+@conditional_page(group_feeds)
 def group_posts(request, slug):
     NeededGroup = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=NeededGroup)
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = cached_feed_page(
+        request,
+        Post.objects.for_feed().filter(group=NeededGroup),
+        f'group:{NeededGroup.pk}')
     return render(
         request,
         'group.html',
-        {'group': NeededGroup, 'page': page})
+        {'group': NeededGroup,
+         'page': page,
+         'feed_cache_key': feed_cache_key(
+             request, f'group:{NeededGroup.pk}')})
+
+
+@conditional_page(lambda request: ['groups', 'group-stats'])
+def group_index(request):
+    """ Каталог групп с числом постов и временем последнего. """
+    return render(
+        request, 'groups.html', {'groups': cached_group_directory()})
+
+
+def search_posts(request):
+    """ Поиск по постам и комментариям, можно ограничить
+    группой (?group=slug) и автором (?author=username). """
+    query = request.GET.get('q', '').strip()
+    filters = {}
+    group_slug = request.GET.get('group')
+    if group_slug:
+        filters['group_id'] = get_object_or_404(Group, slug=group_slug).pk
+    author_name = request.GET.get('author')
+    if author_name:
+        filters['author_id'] = get_object_or_404(
+            User, username=author_name).pk
+    paginator = search.SearchPaginator(query, POSTS_PER_PAGE, **filters)
+    page = paginator.get_page(request.GET.get('cursor'))
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    return render(
+        request,
+        'search.html',
+        {'query': query,
+         'page': page,
+         'pagination_query': params.urlencode()})
 
 
 @login_required
+@write_to_primary
 def new_post(request):
     form = PostForm(
         request.POST or None,
@@ -41,55 +121,84 @@ def new_post(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('index')
     return render(request, 'new_post.html', {'form': form})
 
 
+@read_from_replica
+@conditional_page(profile_feeds)
 def profile(request, username):
-    paginator = Paginator(
-        Post.objects.filter(author=get_object_or_404(
-            User,
-            username=username)),
-        10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    following = (request.user.is_authenticated and Follow.objects.filter(
-        user=request.user,
-        author__username=username).exists())
+    author = get_author(request, username)
+    stats = cached_user_stats(author)
+    page = cached_feed_page(
+        request,
+        Post.objects.for_feed().filter(author_id=author.pk),
+        f'profile:{author.pk}')
+    following = (
+        request.user.is_authenticated and request.user != author
+        and Follow.objects.filter(
+            user=request.user, author_id=author.pk).exists())
     return render(request, 'profile.html', {
         'page': page,
-        'user_profile': get_object_or_404(User, username=username),
-        'count_posts': Post.objects.filter(
-            author=get_object_or_404(
-                User,
-                username=username)).count(),
+        'feed_cache_key': feed_cache_key(
+            request, f'profile:{author.pk}'),
+        'user_profile': author,
+        'count_posts': stats.posts_count,
         'current_user': request.user,
         'following': following,
-        'subscribers':
-            Follow.objects.filter(author__username=username).count(),
-        'subscribes': Follow.objects.filter(user__username=username).count()})
+        'subscribers': stats.followers_count,
+        'subscribes': stats.following_count})
 
 
+@read_from_replica
+@conditional_page(post_feeds)
 def post_view(request, username, post_id):
-    form = PostForm(
-        request.POST or None)
-    post = get_object_or_404(Post, author__username=username, id=post_id)
+    # автор приходит тем же запросом, что и пост
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        author__username=username, id=post_id)
+    # Сам QuerySet в шаблоне не перебирается: выводится порция
+    # comment_page, остальные подгружаются через post_comments.
     comments = Comment.objects.filter(post=post)
     comForm = CommentForm()
+    stats = cached_user_stats(post.author)
     return render(request, 'post.html', {
-        'form': form,
+        'form': comForm,
         'post': post,
         'post_id': post_id,
-        'author': get_object_or_404(User, username=username),
+        'author': post.author,
         'current_user': request.user,
         'comments': comments,
+        'comment_page': comments_page(request, comments),
         'CommentForm': comForm,
-        'subscribers':
-            Follow.objects.filter(author__username=username).count(),
-        'subscribes': Follow.objects.filter(user__username=username).count()})
+        'subscribers': stats.followers_count,
+        'subscribes': stats.following_count})
+
+
+def comments_page(request, comments):
+    """ Порция комментариев по курсору ``?cursor=``, новые первыми. """
+    paginator = CursorPaginator(
+        comments.select_related('author'), COMMENTS_PER_PAGE,
+        field='created')
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+@read_from_replica
+@conditional_page(post_feeds)
+def post_comments(request, username, post_id):
+    """ Следующая порция комментариев - фрагмент HTML
+    для кнопки «Показать ещё» на странице поста. """
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        author__username=username, id=post_id)
+    return render(request, 'comment_list.html', {
+        'post': post,
+        'comment_page': comments_page(request, post.comments.all())})
 
 
 @login_required
+@write_to_primary
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, id=post_id)
     if request.user != post.author:
@@ -100,13 +209,20 @@ def post_edit(request, username, post_id):
         files=request.FILES or None,
         instance=post)
     if form.is_valid():
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            # Копии старой картинки больше не подходят.
+            post.thumbnail_variants = ''
         post.save()
+        if image_changed:
+            thumbnails.schedule(post)
         return redirect(
             reverse('post', kwargs={'username': username, 'post_id': post_id}))
     return render(request, 'new_post.html', {'form': form, 'post': post})
 
 
 @login_required
+@write_to_primary
 def add_comment(request, username, post_id):
     post = get_object_or_404(Post, id=post_id, author__username=username)
     form = CommentForm(
@@ -115,42 +231,44 @@ def add_comment(request, username, post_id):
         comment = form.save(commit=False)
         comment.post = post
         comment.author = request.user
-        comment.save()
+        comment.idempotency_key = write_behind.idempotency_key(
+            request.POST, request.user.pk, post.pk)
+        write_behind.save(comment)
     return redirect('post', username=username, post_id=post_id)
 
 
+@read_from_replica
 @login_required
 def follow_index(request):
-    posts_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts_list = timeline_posts(request.user)
+    # Лента подписок отдаёт в контекст сам паджинатор,
+    # поэтому здесь остаются нумерованные страницы.
+    page = paginate(request, posts_list, numbered=True)
     return render(
         request,
         "follow.html",
         {'page': page,
-         'paginator': paginator,
-         'follow': True})
+         'paginator': page.paginator,
+         'follow': True,
+         'feed_cache_key': feed_cache_key(
+             request, 'index', f'follow:{request.user.pk}')})
 
 
 @login_required
+@write_to_primary
 def profile_follow(request, username):
-    if request.user != get_object_or_404(User, username=username):
-        try:
-            Follow.objects.create(
-                user=request.user,
-                author=get_object_or_404(User, username=username)
-            )
-        except IntegrityError:
-            return redirect('profile', username=username)
+    author = get_author(request, username)
+    if request.user != author:
+        write_behind.save(Follow(user=request.user, author=author))
     return redirect('profile', username=username)
 
 
 @login_required
+@write_to_primary
 def profile_unfollow(request, username):
     Follow.objects.filter(
         user=request.user,
-        author=get_object_or_404(User, username=username)).delete()
+        author=get_author(request, username)).delete()
     return redirect('profile', username=username)
 
 
@@ -0,0 +1,249 @@
+""" Пакетная запись комментариев и подписок.
+
+С ``WRITE_BEHIND`` представления не пишут комментарий или подписку
+сами, а ставят объект в очередь процесса. Один поток-писатель
+собирает то, что накопилось за ``WRITE_BEHIND_DELAY`` секунд, и
+записывает всё одной транзакцией через ``bulk_create``: в SQLite
+вместо сотни конкурирующих за блокировку коротких транзакций
+получается одна.
+
+Запрос ждёт коммита своей пачки не дольше ``WRITE_BEHIND_WAIT``
+секунд, поэтому после редиректа автор видит свой комментарий,
+в каком бы процессе ни обрабатывался следующий запрос. С нулевым
+ожиданием запрос возвращается сразу, но тогда запись может
+появиться с задержкой.
+
+Повторы не создают дубликатов: у комментария есть ключ из ключа
+повтора формы и текста (``idempotency_key``), у подписки - пара
+(user, author).
+Без ``WRITE_BEHIND`` объекты сохраняются сразу, с теми же
+правилами для повторов. """
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.db import (IntegrityError, OperationalError, close_old_connections,
+                       transaction)
+from django.db.models import Q
+
+from . import feed_cache, routers, search, signals
+from .models import Comment, Follow
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND = getattr(settings, 'WRITE_BEHIND', False)
+WRITE_BEHIND_BATCH = getattr(settings, 'WRITE_BEHIND_BATCH', 500)
+WRITE_BEHIND_DELAY = getattr(settings, 'WRITE_BEHIND_DELAY', 0.005)
+WRITE_BEHIND_WAIT = getattr(settings, 'WRITE_BEHIND_WAIT', 5)
+WRITE_BEHIND_RETRIES = getattr(settings, 'WRITE_BEHIND_RETRIES', 3)
+
+
+def idempotency_key(data, user_id, post_id):
+    """ Ключ комментария из ключа повтора формы, автора, поста и
+    текста или None, если браузер ключ не прислал.
+
+    Повтор той же отправки даёт тот же ключ, а другой текст с тем
+    же ключом формы (вторая вкладка, форма после «Назад») -
+    другой. """
+    try:
+        token = uuid.UUID(data.get('idempotency_key', ''))
+    except ValueError:
+        return None
+    return uuid.uuid5(token, f'{user_id}:{post_id}:{data.get("text", "")}')
+
+
+def insert(model, objs):
+    """ Вставляет объекты одним запросом. Если другой процесс успел
+    записать такой же объект, вставляет по одному, пропуская
+    дубликаты. Возвращает записанные объекты. """
+    if not objs:
+        return []
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(objs)
+        return objs
+    except IntegrityError:
+        pass
+    saved = []
+    for obj in objs:
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create([obj])
+        except IntegrityError:
+            continue
+        saved.append(obj)
+    return saved
+
+
+def new_comments(comments):
+    """ Комментарии без повторов ключа в пачке и в базе. """
+    keys = {comment.idempotency_key for comment in comments} - {None}
+    seen = set(Comment.objects.filter(
+        idempotency_key__in=keys).values_list('idempotency_key', flat=True))
+    fresh = []
+    for comment in comments:
+        key = comment.idempotency_key
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        fresh.append(comment)
+    return fresh
+
+
+def new_follows(follows):
+    """ Подписки без повторов пары (user, author) в пачке и в базе. """
+    pairs = {(follow.user_id, follow.author_id) for follow in follows}
+    if not pairs:
+        return []
+    condition = Q()
+    for user_id, author_id in pairs:
+        condition |= Q(user_id=user_id, author_id=author_id)
+    seen = set(Follow.objects.filter(condition).values_list(
+        'user_id', 'author_id'))
+    fresh = []
+    for follow in follows:
+        pair = follow.user_id, follow.author_id
+        if pair not in seen:
+            seen.add(pair)
+            fresh.append(follow)
+    return fresh
+
+
+def write_batch(objs):
+    """ Записывает комментарии и подписки одной транзакцией вместе
+    со счётчиками; кэш лент сбрасывается после коммита. Возвращает
+    множество id записанных объектов, повторы в него не попадают. """
+    # Повторы отсеиваются до транзакции: в SQLite транзакция,
+    # начатая чтением, не может дождаться блокировки на запись
+    # и сразу падает с database is locked. Гонку с другим
+    # процессом разбирает insert.
+    comments = new_comments(
+        [obj for obj in objs if isinstance(obj, Comment)])
+    follows = new_follows([obj for obj in objs if isinstance(obj, Follow)])
+    with transaction.atomic():
+        comments = insert(Comment, comments)
+        follows = insert(Follow, follows)
+        for post_id, count in Counter(
+                comment.post_id for comment in comments).items():
+            signals.comments_added(post_id, count)
+            search.get_backend().index_latest_comments(post_id, count)
+        signals.follows_added(follows)
+    posts = {comment.post_id: comment.post for comment in comments}
+    feeds = set()
+    for post in posts.values():
+        feeds.update(feed_cache.post_feeds(post))
+    for follow in follows:
+        feeds.update(signals.follow_feeds(follow))
+    if feeds:
+        feed_cache.bump(*sorted(feeds))
+    return {id(obj) for obj in comments + follows}
+
+
+class WriteQueue:
+    """ Очередь объектов на запись и поток, записывающий её пачками. """
+
+    def __init__(self):
+        self.pending = []
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def submit(self, obj):
+        """ Ставит объект в очередь. Future завершится после коммита
+        с True или с False, если такой объект уже был записан. """
+        future = Future()
+        with self.condition:
+            self.pending.append((obj, future))
+            self.condition.notify()
+            self.start()
+        return future
+
+    def start(self):
+        # После fork поток родителя в дочернем процессе не работает.
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(
+                target=self.run, name='write-behind', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+            # Даём набраться записям соседних запросов.
+            time.sleep(WRITE_BEHIND_DELAY)
+            self.flush()
+
+    def take(self):
+        with self.condition:
+            batch = self.pending[:WRITE_BEHIND_BATCH]
+            del self.pending[:WRITE_BEHIND_BATCH]
+        return batch
+
+    @staticmethod
+    def write(objs):
+        """ write_batch с повторами: транзакция пачки откатилась
+        целиком, и её можно повторить, пока SQLite занята читателями. """
+        for attempt in range(WRITE_BEHIND_RETRIES):
+            try:
+                return write_batch(objs)
+            except OperationalError:
+                if attempt == WRITE_BEHIND_RETRIES - 1:
+                    raise
+                logger.warning('Пачка не записана, попытка %s', attempt + 1)
+                time.sleep(WRITE_BEHIND_DELAY * 2 ** attempt)
+
+    def flush(self):
+        """ Записывает накопившиеся объекты в текущем потоке. """
+        batch = self.take()
+        while batch:
+            close_old_connections()
+            try:
+                written = self.write([obj for obj, _ in batch])
+            except Exception as error:
+                logger.exception('Не удалось записать пачку из %s объектов',
+                                 len(batch))
+                for _, future in batch:
+                    future.set_exception(error)
+            else:
+                for obj, future in batch:
+                    future.set_result(id(obj) in written)
+            finally:
+                close_old_connections()
+            batch = self.take()
+
+
+queue = WriteQueue()
+# Не теряем очередь при остановке процесса.
+atexit.register(queue.flush)
+
+
+def save(obj):
+    """ Сохраняет комментарий или подписку; повтор уже записанного
+    объекта молча пропускается. Возвращает True, если объект
+    записан этим вызовом, и None, если запись ещё в очереди. """
+    if not WRITE_BEHIND:
+        try:
+            with transaction.atomic():
+                obj.save()
+        except IntegrityError:
+            return False
+        return True
+    # Запись уйдёт в другой поток, где db_for_write не знает
+    # о запросе: окно основной базы открывается здесь.
+    routers.mark_written()
+    future = queue.submit(obj)
+    if not WRITE_BEHIND_WAIT:
+        return None
+    try:
+        return future.result(timeout=WRITE_BEHIND_WAIT)
+    except FutureTimeoutError:
+        logger.warning('Запись %r не дождалась коммита за %s с',
+                       obj, WRITE_BEHIND_WAIT)
+        return None
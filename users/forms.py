@@ -1,3 +1,5 @@
+from django import forms
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
 
@@ -10,3 +12,9 @@ class CreationForm(UserCreationForm):
         """ Метакласс формы регистрации. """
         model = User
         fields = ("first_name", "last_name", "username", "email")
+
+    def clean_username(self):
+        username = self.cleaned_data["username"]
+        if username.lower() in settings.RESERVED_USERNAMES:
+            raise forms.ValidationError("Это имя пользователя занято.")
+        return username
@@ -21,6 +21,7 @@ INSTALLED_APPS = [
     'django_filters',
     'rest_framework.authtoken',
     'about',
+    'api',
     'users',
     'posts',
     'django.contrib.admin',
@@ -34,6 +35,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     # 'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'posts.instrumentation.InstrumentationMiddleware',
+    'posts.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -73,6 +76,45 @@ DATABASES = {
     }
 }
 
+# Профиль базы выбирается переменной окружения YATUBE_DB_PROFILE:
+# default - настройки SQLite по умолчанию и соединение на каждый запрос,
+# production - журнал WAL (читатели не ждут писателя), synchronous=NORMAL
+# (в WAL не теряет целостность при сбое), отображение файла в память,
+# кэш страниц 64 МБ, ожидание блокировки и постоянные соединения.
+# Прагмы выполняет posts.sqlite при открытии соединения.
+SQLITE_PROFILES = {
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    },
+}
+DB_PROFILE = os.environ.get('YATUBE_DB_PROFILE', 'default')
+SQLITE_PRAGMAS = SQLITE_PROFILES[DB_PROFILE]
+if DB_PROFILE == 'production':
+    DATABASES['default']['CONN_MAX_AGE'] = int(
+        os.environ.get('YATUBE_CONN_MAX_AGE', 600))
+
+# Реплика для чтения лент и профилей (см. posts.routers): путь
+# к её файлу SQLite в YATUBE_REPLICA_NAME. В тестах реплика
+# совпадает с основной базой.
+REPLICA_NAME = os.environ.get('YATUBE_REPLICA_NAME')
+if REPLICA_NAME:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': REPLICA_NAME,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['posts.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('YATUBE_REPLICA_STICKY', 10))
+# Сколько секунд реплика может отставать: дольше прочитанное
+# с неё в кэше не хранится.
+REPLICA_MAX_LAG = int(os.environ.get('YATUBE_REPLICA_MAX_LAG', 5))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -106,15 +148,62 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки больше 512 КБ пишутся потоком во временный файл,
+# а после POST_IMAGE_MAX_BYTES данные перестают сохраняться.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_SIDE = 2048
+
+# Первые сегменты адресов сайта: профиль пользователя с таким
+# именем был бы недоступен, поэтому при регистрации они заняты.
+RESERVED_USERNAMES = (
+    'about', 'admin', 'api', 'auth', 'follow', 'group', 'media',
+    'metrics', 'new', 'search', 'static')
+
 LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "index"
 
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
+# Кэш выбирается переменной окружения YATUBE_CACHE:
+# locmem - отдельный кэш в каждом процессе (по умолчанию),
+# file - общий файловый кэш для всех воркеров на одной машине,
+# memcached - общий кэш на сервере YATUBE_CACHE_LOCATION.
+# Процессы не видят версий лент в чужом locmem, поэтому с ним
+# кэш лент и ETag живут не дольше LOCAL_CACHE_TIMEOUT секунд;
+# для нескольких воркеров нужен file или memcached.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+}
+CACHE_DEFAULT_LOCATIONS = {
+    'locmem': 'yatube',
+    'file': os.path.join(BASE_DIR, 'cache'),
+    'memcached': '127.0.0.1:11211',
+}
+CACHE_NAME = os.environ.get('YATUBE_CACHE', 'locmem')
+CACHE_SHARED = CACHE_NAME != 'locmem'
+LOCAL_CACHE_TIMEOUT = int(os.environ.get('YATUBE_LOCAL_CACHE_TIMEOUT', 60))
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_NAME],
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', CACHE_DEFAULT_LOCATIONS[CACHE_NAME]),
+        'KEY_PREFIX': 'yatube',
+        'VERSION': int(os.environ.get('YATUBE_CACHE_VERSION', 1)),
+        'TIMEOUT': 300,
+        # у memcached свои ограничения, OPTIONS уходят в клиент
+        'OPTIONS': (
+            {} if CACHE_NAME == 'memcached' else {'MAX_ENTRIES': 10000}),
     }
 }
 
@@ -131,6 +220,17 @@ REST_FRAMEWORK = {
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_URLS_REGEX = r'^/api/.*$'
 
+# Доля замеряемых запросов (0 - замеры выключены) и сколько
+# SQL-запросов на страницу допустимо без предупреждения в логе.
+PERF_SAMPLE_RATE = float(os.environ.get('YATUBE_PERF_SAMPLE_RATE', 0))
+PERF_QUERY_BUDGET = int(os.environ.get('YATUBE_PERF_QUERY_BUDGET', 20))
+
+# Пакетная запись комментариев и подписок одним потоком
+# (см. posts.write_behind) и сколько секунд запрос ждёт коммита
+# своей записи: 0 - не ждать.
+WRITE_BEHIND = os.environ.get('YATUBE_WRITE_BEHIND') == '1'
+WRITE_BEHIND_WAIT = float(os.environ.get('YATUBE_WRITE_BEHIND_WAIT', 5))
+
 # INTERNAL_IPS = [
 #     "127.0.0.1",
 # ]
@@ -3,6 +3,7 @@ from django.conf.urls import handler404, handler500
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
+from posts import instrumentation
 
 handler404 = 'posts.views.page_not_found'  # noqa
 handler500 = 'posts.views.server_error'  # noqa
@@ -12,6 +13,8 @@ urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/', include('api.urls')),
+    path('metrics/', instrumentation.metrics_view, name='metrics'),
     path('', include('posts.urls')),
 ]
 if settings.DEBUG: